@@ -0,0 +1,264 @@
+import os
+import re
+import sys
+import mmap
+import struct
+import argparse
+from array import array
+from collections import namedtuple
+
+from utils import encode_move, decode_move
+
+# The archive of the project, written by "python archive.py convert" from the "Player i VS Player j" folders
+ARCHIVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "games.bin")
+
+# File layout, all little-endian:
+#   header   magic, version, number of games n and offset of the index
+#   games    one block per game: label length (uint16), number of actions (uint32), result (int8), the label in
+#            UTF-8, then every history entry packed by utils.encode_move (uint32)
+#   index    n × uint64, the offset of each game block
+MAGIC = b"ACGA"
+VERSION = 1
+_HEADER = struct.Struct("<4sIQQ")
+_GAME = struct.Struct("<HIb")
+RESULTS = {"red": 1, "draw": 0, "black": -1, None: -2}
+WINNERS = {result: winner for winner, result in RESULTS.items()}
+
+Game = namedtuple("Game", "label winner history")
+
+
+class ArchiveWriter:
+    """
+    Write games to an archive file, one block after the other, and the index of their offsets at the end.
+
+    The file is written next to path and moved over it on close, so readers never see a partial archive.
+    """
+
+    def __init__(self, path: str = ARCHIVE_PATH):
+
+        self.path = path
+        self.file = open(path + ".tmp", "wb")
+        self.file.write(_HEADER.pack(MAGIC, VERSION, 0, 0))
+        self.offsets = array("Q")
+
+    def add(self, history, winner: str = None, label: str = ""):
+        """
+        Append a game.
+
+        Args:
+            - history: five-element entries (old_x, old_y, new_x, new_y, eaten_id), as recorded by the games.
+            - winner: "red", "black", "draw", or None when the result is unknown.
+            - label: a name to find the game by, e.g. "Player 1 VS Player 2/Game 3".
+
+        Returns:
+            - index: the number of the game in the archive.
+        """
+
+        label_bytes = label.encode("utf-8")
+        moves = array("I", [encode_move(*entry) for entry in history])
+        if sys.byteorder != "little":
+            moves.byteswap()
+        self.offsets.append(self.file.tell())
+        self.file.write(_GAME.pack(len(label_bytes), len(moves), RESULTS[winner]))
+        self.file.write(label_bytes)
+        moves.tofile(self.file)
+        return len(self.offsets) - 1
+
+    def close(self):
+        index_offset = self.file.tell()
+        offsets = array("Q", self.offsets)
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        offsets.tofile(self.file)
+        self.file.seek(0)
+        self.file.write(_HEADER.pack(MAGIC, VERSION, len(self.offsets), index_offset))
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameArchive:
+    """
+    A read-only game archive, memory-mapped: opening it reads the header only, game n is found through the index
+    and decoded on demand, and iterating streams the games in order.
+
+    Args:
+        - path: the archive file, written by ArchiveWriter.
+    """
+
+    def __init__(self, path: str = ARCHIVE_PATH):
+
+        self.path = path
+        with open(path, "rb") as archive_file:
+            self._map = mmap.mmap(archive_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, index_offset = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a game archive of version {VERSION}")
+        if len(self._map) != index_offset + 8 * count:
+            self._map.close()
+            raise ValueError(f"{path} is truncated")
+
+        self.count = count
+        self._labels = None
+        if sys.byteorder == "little":
+            self.offsets = memoryview(self._map)[index_offset:].cast("Q")
+        else:
+            self.offsets = array("Q", self._map[index_offset:])
+            self.offsets.byteswap()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index: int):
+        """Game(label, winner, history) of game index, history being a list of five-element tuples."""
+
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("game index out of range")
+        offset = self.offsets[index]
+        label_length, plies, result = _GAME.unpack_from(self._map, offset)
+        start = offset + _GAME.size + label_length
+        label = self._map[offset + _GAME.size:start].decode("utf-8")
+        moves = array("I", self._map[start:start + 4 * plies])
+        if sys.byteorder != "little":
+            moves.byteswap()
+        return Game(label, WINNERS[result], [decode_move(move) for move in moves])
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def find(self, label: str):
+        """The index of the game labelled label, or None. The labels are read on the first call."""
+
+        if self._labels is None:
+            self._labels = {}
+            for index in range(self.count):
+                offset = self.offsets[index]
+                label_length = _GAME.unpack_from(self._map, offset)[0]
+                name = self._map[offset + _GAME.size:offset + _GAME.size + label_length].decode("utf-8")
+                self._labels.setdefault(name, index)
+        return self._labels.get(label)
+
+    def close(self):
+        if isinstance(self.offsets, memoryview):
+            self.offsets.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def parse_history_text(text: str):
+    """
+    Parse the history written to a "Game N.txt" file, a list of five-element tuples of integers in Python syntax.
+
+    Raises ValueError when the text is not exactly such a list, so that nothing is lost in a conversion.
+    """
+
+    numbers = [int(number) for number in re.findall(r"-?\d+", text)]
+    if len(numbers) % 5 != 0:
+        raise ValueError("a game record must hold five numbers per action")
+    history = [tuple(numbers[i:i + 5]) for i in range(0, len(numbers), 5)]
+    if str(history) != text.strip():
+        raise ValueError("a game record must be a list of five-element tuples")
+    return history
+
+
+def parse_result(text: str):
+    """The winner ("red", "black", "draw" or None) of a game from the text logged by play_headless_game."""
+
+    if "Red wins" in text:
+        return "red"
+    if "Black wins" in text:
+        return "black"
+    if "draw" in text:
+        return "draw"
+    return None
+
+
+def read_match_folder(folder: str):
+    """
+    Read the games of a "Player i VS Player j" folder, with their results from its summary.txt if present.
+
+    Yields:
+        - (game, history, winner) for every "Game N.txt", game being N, in the order of N.
+    """
+
+    winners = {}
+    summary_path = os.path.join(folder, "summary.txt")
+    if os.path.exists(summary_path):
+        with open(summary_path, "r") as summary_file:
+            for line in summary_file:
+                match = re.match(r"Game (\d+): (.*)", line)
+                if match:
+                    winners[int(match.group(1))] = parse_result(match.group(2))
+
+    games = []
+    for name in os.listdir(folder):
+        match = re.fullmatch(r"Game (\d+)\.txt", name)
+        if match:
+            games.append(int(match.group(1)))
+    for game in sorted(games):
+        with open(os.path.join(folder, f"Game {game}.txt"), "r") as game_file:
+            history = parse_history_text(game_file.read())
+        yield game, history, winners.get(game)
+
+
+def match_folders(directory: str):
+    """The "Player i VS Player j" folders in directory, sorted by i and j."""
+
+    folders = []
+    for name in os.listdir(directory):
+        match = re.fullmatch(r"Player (\d+) VS Player (\d+)", name)
+        if match and os.path.isdir(os.path.join(directory, name)):
+            folders.append((int(match.group(1)), int(match.group(2)), name))
+    return [os.path.join(directory, name) for _, _, name in sorted(folders)]
+
+
+def convert_folders(folders, path: str = ARCHIVE_PATH):
+    """
+    Convert "Player i VS Player j" folders of "Game N.txt" records into one archive, each game labelled
+    "Player i VS Player j/Game N".
+
+    Returns:
+        - count: the number of games written.
+    """
+
+    with ArchiveWriter(path) as writer:
+        for folder in folders:
+            name = os.path.basename(os.path.normpath(folder))
+            for game, history, winner in read_match_folder(folder):
+                writer.add(history, winner, f"{name}/Game {game}")
+        return len(writer.offsets)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert game records into an archive, or inspect one.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert_parser = subparsers.add_parser("convert", help='convert "Player i VS Player j" folders')
+    convert_parser.add_argument("folders", nargs="*", help="the folders, all those of the project by default")
+    convert_parser.add_argument("-o", "--output", default=ARCHIVE_PATH, help="the archive to write")
+    info_parser = subparsers.add_parser("info", help="list the games of an archive")
+    info_parser.add_argument("archive", nargs="?", default=ARCHIVE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        folders = args.folders or match_folders(os.path.dirname(os.path.abspath(__file__)))
+        count = convert_folders(folders, args.output)
+        print(f"{args.output}: {count} games from {len(folders)} folders")
+    else:
+        with GameArchive(args.archive) as archive:
+            for index, game in enumerate(archive):
+                print(f"{index}: {game.label}, {len(game.history)} actions, winner: {game.winner}")
+            print(f"{args.archive}: {len(archive)} games")
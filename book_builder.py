@@ -0,0 +1,206 @@
+import json
+import struct
+import argparse
+
+from utils import init_board, encode_move
+from zobrist import hash_board, move_key
+from opening_book import BOOK_PATH, read_csv_book, write_sorted_book
+from selfplay import read_positions
+from archive import GameArchive, read_match_folder
+from external_sort import SortedRuns
+
+BOOK_PLY = 16               # players 6 and 7 consult the book for their moves before ply 16
+MAX_ENTRIES = 1000000       # (position, move) pairs aggregated in memory before they are spilled to a run file
+
+# A spilled entry: key, move, count, wins, draws, losses
+_RECORD = struct.Struct("<QIIIII")
+
+
+class BookBuilder:
+    """
+    Aggregate the moves played from each position of many games into an opening book, with bounded memory.
+
+    Games are replayed with an incremental Zobrist hash. For every (position, move) pair of the first plies
+    the builder counts how often the move was played and how the games ended for the side that played it.
+    When more than max_entries pairs are held, they are written sorted to a temporary run file; the runs are
+    merged when the book is written, so memory does not grow with the number of games.
+
+    Args:
+        - max_ply: how many plies of each game go into the book.
+        - max_entries: the number of pairs kept in memory.
+        - temp_dir: where the run files go, the system temporary directory by default.
+    """
+
+    def __init__(self, max_ply: int = BOOK_PLY, max_entries: int = MAX_ENTRIES, temp_dir: str = None):
+
+        self.max_ply = max_ply
+        self.max_entries = max_entries
+        self.temp_dir = temp_dir
+        self.table = {}     # (key, move): [count, wins, draws, losses]
+        self.runs = SortedRuns(_RECORD, temp_dir)
+        self.games = 0
+        self.positions = 0
+
+    def add_game(self, history, winner=None):
+        """
+        Add the first plies of a game.
+
+        Args:
+            - history: the actions of the game from the initial position, four- or five-element tuples.
+            - winner: "red", "black", "draw", or None when the result is unknown.
+        """
+
+        board = init_board()
+        side = "red"
+        board_hash = hash_board(board)
+        for action in history[:self.max_ply]:
+            old_x, old_y, new_x, new_y = action[0], action[1], action[2], action[3]
+            piece_id = board[old_x][old_y]
+            eaten_id = board[new_x][new_y]
+            if piece_id == 0 or piece_id * (1 if side == "red" else -1) < 0:
+                break   # the record does not match the replay, keep what was read so far
+
+            if winner is None:
+                result = None
+            elif winner == "draw":
+                result = 2
+            else:
+                result = 1 if winner == side else 3
+            self.add_position(board_hash, encode_move(old_x, old_y, new_x, new_y), result)
+
+            board_hash = move_key(board_hash, piece_id, old_x * 9 + old_y, new_x * 9 + new_y, eaten_id)
+            board[new_x][new_y] = piece_id
+            board[old_x][old_y] = 0
+            side = "black" if side == "red" else "red"
+        self.games += 1
+
+    def add_position(self, key, move, result=None, count=1):
+        """Count move played count times from the position key; result is 1, 2 or 3 for a win, draw or loss."""
+
+        entry = self.table.get((key, move))
+        if entry is None:
+            entry = self.table[(key, move)] = [0, 0, 0, 0]
+        entry[0] += count
+        if result is not None:
+            entry[result] += count
+        self.positions += count
+        if len(self.table) >= self.max_entries:
+            self.spill()
+
+    def spill(self):
+        """Write the pairs held in memory to a sorted run file and forget them."""
+
+        if not self.table:
+            return
+        self.runs.spill((key, move, *entry) for (key, move), entry in sorted(self.table.items()))
+        self.table = {}
+
+    def entries(self):
+        """
+        Yield (key, move, count, wins, draws, losses) for every pair, sorted by (key, move), merging the runs
+        and the pairs still in memory.
+        """
+
+        current = None
+        for record in self.runs.merge((key, move, *entry) for (key, move), entry in sorted(self.table.items())):
+            if current is not None and record[0] == current[0] and record[1] == current[1]:
+                for i in range(2, 6):
+                    current[i] += record[i]
+            else:
+                if current is not None:
+                    yield tuple(current)
+                current = list(record)
+        if current is not None:
+            yield tuple(current)
+
+    def write(self, path: str = BOOK_PATH, min_count: int = 1, min_score: float = 0.0):
+        """
+        Write the book, weighting every move by how often it was played.
+
+        Args:
+            - path: the book file.
+            - min_count: moves played fewer times are left out.
+            - min_score: moves whose score (wins + draws / 2) / games with a known result is lower are left out.
+
+        Returns:
+            - count: the number of entries written.
+        """
+
+        def kept():
+            for key, move, count, wins, draws, losses in self.entries():
+                known = wins + draws + losses
+                if count < min_count or (known and (wins + draws / 2) / known < min_score):
+                    continue
+                yield key, move, count
+
+        count = write_sorted_book(path, kept())
+        self.runs.close()
+        return count
+
+
+def read_game_folder(folder: str):
+    """
+    Read the games of a "Player X VS Player Y" folder, with their results from its summary.txt if present.
+
+    Yields:
+        - (history, winner) for every "Game N.txt".
+    """
+
+    for _, history, winner in read_match_folder(folder):
+        yield history, winner
+
+
+def read_jsonl_games(path: str):
+    """
+    Read headless games saved one per line as JSON objects {"winner": ..., "text": ..., "history": [...]},
+    the values returned by play_headless_game.
+
+    Yields:
+        - (history, winner) for every line.
+    """
+
+    with open(path, "r") as jsonl_file:
+        for line in jsonl_file:
+            if line.strip():
+                game = json.loads(line)
+                yield game["history"], game.get("winner")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the opening book from game records.")
+    parser.add_argument("--folder", action="append", default=[],
+                        help='a "Player X VS Player Y" folder of Game N.txt records')
+    parser.add_argument("--archive", action="append", default=[], help="a game archive of archive.py")
+    parser.add_argument("--jsonl", action="append", default=[], help="headless games saved as JSON lines")
+    parser.add_argument("--selfplay", action="append", default=[], help="a self-play file of selfplay.py")
+    parser.add_argument("--csv", action="append", default=[], help="a CSV book of (board, action) rows")
+    parser.add_argument("-o", "--output", default=BOOK_PATH, help="the book file to write")
+    parser.add_argument("--max-ply", type=int, default=BOOK_PLY, help="plies of each game put in the book")
+    parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES, help="pairs held in memory")
+    parser.add_argument("--min-count", type=int, default=1, help="leave out moves played fewer times")
+    parser.add_argument("--min-score", type=float, default=0.0, help="leave out moves scoring less")
+    args = parser.parse_args()
+
+    builder = BookBuilder(args.max_ply, args.max_entries)
+    for folder in args.folder:
+        for history, winner in read_game_folder(folder):
+            builder.add_game(history, winner)
+    for path in args.archive:
+        with GameArchive(path) as archive:
+            for game in archive:
+                builder.add_game(game.history, game.winner)
+    for path in args.jsonl:
+        for history, winner in read_jsonl_games(path):
+            builder.add_game(history, winner)
+    for path in args.selfplay:
+        for position in read_positions(path):
+            if position.ply < args.max_ply:
+                # The result of the game for the side to move: 1 win, 2 draw, 3 loss
+                result = position.result if position.side == "red" else -position.result
+                builder.add_position(position.key, position.move, 2 - result)
+    for path in args.csv:
+        for key, move, count in read_csv_book(path):
+            builder.add_position(key, move, count=count)
+
+    count = builder.write(args.output, args.min_count, args.min_score)
+    print(f"{args.output}: {count} entries from {builder.games} games and {builder.positions} positions")
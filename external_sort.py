@@ -0,0 +1,122 @@
+import os
+import sys
+import heapq
+import shutil
+import tempfile
+from array import array
+
+# Shared by the builders of the binary files of the project (opening_book, book_builder, position_index):
+# sorting more records than fit in memory, and writing a file of sorted records column by column.
+
+_READ_RECORDS = 4096    # records read from a run file at a time
+_CHUNK = 1 << 16        # entries buffered per column by write_columns before they are flushed
+
+
+class SortedRuns:
+    """
+    Sorted runs of fixed-size records in temporary files, for an external merge sort.
+
+    Records are packed by one struct.Struct. Each spill writes one run, and merge streams every run with
+    the records still in memory in sorted order, holding one read buffer per run.
+
+    Args:
+        - record: the struct.Struct of a record.
+        - temp_dir: where the run files go, the system temporary directory by default.
+    """
+
+    def __init__(self, record, temp_dir: str = None):
+
+        self.record = record
+        self.temp_dir = temp_dir
+        self.files = []
+
+    def __len__(self):
+        return len(self.files)
+
+    def spill(self, records):
+        """Write records, already sorted, to a new run file."""
+
+        run_file = tempfile.TemporaryFile(dir=self.temp_dir)
+        pack = self.record.pack
+        run_file.write(b"".join(pack(*record) for record in records))
+        self.files.append(run_file)
+
+    def merge(self, *sorted_records):
+        """Yield the records of every run and of the sorted iterables sorted_records, in sorted order."""
+
+        return heapq.merge(*[self._read(run_file) for run_file in self.files], *sorted_records)
+
+    def _read(self, run_file):
+        run_file.seek(0)
+        read_size = self.record.size * _READ_RECORDS
+        while True:
+            chunk = run_file.read(read_size)
+            if not chunk:
+                return
+            yield from self.record.iter_unpack(chunk)
+
+    def close(self):
+        """Delete the run files."""
+
+        for run_file in self.files:
+            run_file.close()
+        self.files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_columns(path: str, header, entries, typecodes):
+    """
+    Write a file of a header followed by the columns of entries, little-endian, without holding the entries in
+    memory: the first column goes straight to the file and the others through temporary files.
+
+    Args:
+        - path: the file to write. It is written next to path and moved over it, so readers never see a partial
+            file and running processes keep their old mapping.
+        - header: a function returning the header from the number of entries, of the same size for any number.
+        - entries: tuples of one value per column, in the order of the file.
+        - typecodes: the array typecode of every column.
+
+    Returns:
+        - count: the number of entries written.
+    """
+
+    temp_path = path + ".tmp"
+    count = 0
+    with open(temp_path, "wb") as data_file:
+        data_file.write(header(0))
+        column_files = [data_file] + [tempfile.TemporaryFile() for _ in typecodes[1:]]
+        columns = [array(typecode) for typecode in typecodes]
+        try:
+            for entry in entries:
+                for column, value in zip(columns, entry):
+                    column.append(value)
+                if len(columns[0]) == _CHUNK:
+                    count += _flush_columns(columns, column_files)
+            count += _flush_columns(columns, column_files)
+
+            for column_file in column_files[1:]:
+                column_file.seek(0)
+                shutil.copyfileobj(column_file, data_file)
+        finally:
+            for column_file in column_files[1:]:
+                column_file.close()
+        data_file.seek(0)
+        data_file.write(header(count))
+    os.replace(temp_path, path)
+    return count
+
+
+def _flush_columns(columns, column_files):
+    # Append every buffered column to its file, little-endian, and empty the buffers
+    count = len(columns[0])
+    for column, column_file in zip(columns, column_files):
+        if sys.byteorder != "little":
+            column.byteswap()
+        column.tofile(column_file)
+        del column[:]
+    return count
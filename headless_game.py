@@ -3,8 +3,12 @@ import multiprocessing
 
 from utils import get_legal_actions, init_board, change_round
 
+TIME_LIMIT = 10     # Thinking time of a move in seconds
+TIME_RESERVE = 0.5  # Extra time allowed for starting the process and passing the board and the action
 
-def play_headless_game(red, black, timeout: bool = False):
+
+def play_headless_game(red, black, timeout: bool = False, persistent: bool = False, opening: list = None,
+                       scores: list = None):
     """
     Start a game using "red" and "black" agents with timeout.
 
@@ -15,6 +19,15 @@ def play_headless_game(red, black, timeout: bool = False):
             final match. When timeout is set to false (default), it means there is no limitation on the thinking time, 
             which is useful for collecting learning data. This mode also has lower overhead due to the removal of 
             the timing thread.
+        - persistent: only used with timeout. Each player then lives in one worker process for the whole game
+            instead of a new process per move, so what it keeps between moves (e.g. its transposition table)
+            survives and no process is started or pickled per move. The time limit is measured here, and a
+            worker is only killed when its player actually overruns.
+        - opening: actions (old_x, old_y, new_x, new_y) played from the initial position before the players take
+            over, red first. They are part of the returned history.
+        - scores: if given, filled with the search value (red's view) of every action of the history, read from
+            the search_value attribute of the player that chose it. It is None for the opening actions, for
+            players without one, and with timeout, where the players search in other processes.
 
     Returns:
         - winner: "red", "black" and "draw".
@@ -29,63 +42,86 @@ def play_headless_game(red, black, timeout: bool = False):
     winner = None   # Final winner
     text = None  # Explain the reason for the end of the match
 
-    # Start the game
-    while True:
-
-        copy_board = copy.deepcopy(board)
-        action_list = get_legal_actions(copy_board, round, history)
-
-        # Game Over
-        if len(action_list) == 0:
-            if round == "red":
-                text = "Red loses the game. Black wins!"
-                winner = "black"
-            elif round == "black":
-                text = "Black loses the game. Red wins!"
-                winner = "red"
-            break
-
-        # Get action
-        if round == "red":
-            red.update_history(copy.deepcopy(history))
-            action = get_player_action_with_timeout(
-                copy_board, red) if timeout else red.policy(board)
-        elif round == "black":
-            black.update_history(copy.deepcopy(history))
-            action = get_player_action_with_timeout(
-                copy_board, black) if timeout else black.policy(board)
-
-        # Check action
-        if action not in action_list:
-            if round == "red":
-                text = "Red timeout, Black wins!" if action == "Timed out" else "Red moves illegally, Black wins!"
-                winner = "black"
-                break
-
-            elif round == "black":
-                text = "Black timeout, Red wins!" if action == "Timed out" else "Black moves illegally, Red wins!"
-                winner = "red"
-                break
-
-        # Record game state and change game state
-        action_history = (action[0], action[1], action[2],
-                          action[3], board[action[2]][action[3]])
-        history.append(action_history)
-
-        # Take action
+    # Play the opening moves
+    for action in opening or []:
+        history.append((action[0], action[1], action[2], action[3], board[action[2]][action[3]]))
         board[action[2]][action[3]] = board[action[0]][action[1]]
         board[action[0]][action[1]] = 0
-
-        if action_history[4] != 0:  # Refresh the record when some piece is eaten
-            step = 0
-        else:
-            step += 1
-            if step == 120:    # Draw
-                text = "Both sides have not eaten in sixty rounds, draw!"
-                winner = "draw"
+        round = change_round(round)
+        if scores is not None:
+            scores.append(None)
+
+    workers = None
+    if timeout and persistent:
+        workers = {"red": PlayerWorker(red), "black": PlayerWorker(black)}
+
+    # The workers are stopped however the game ends, since they are not daemons and would keep the process alive
+    try:
+        # Start the game
+        while True:
+
+            copy_board = copy.deepcopy(board)
+            action_list = get_legal_actions(copy_board, round, history)
+
+            # Game Over
+            if len(action_list) == 0:
+                if round == "red":
+                    text = "Red loses the game. Black wins!"
+                    winner = "black"
+                elif round == "black":
+                    text = "Black loses the game. Red wins!"
+                    winner = "red"
                 break
 
-        round = change_round(round)
+            # Get action
+            if workers is not None:
+                action = workers[round].get_action(copy_board, history)
+            elif round == "red":
+                red.update_history(copy.deepcopy(history))
+                action = get_player_action_with_timeout(
+                    copy_board, red) if timeout else red.policy(board)
+            elif round == "black":
+                black.update_history(copy.deepcopy(history))
+                action = get_player_action_with_timeout(
+                    copy_board, black) if timeout else black.policy(board)
+
+            # Check action
+            if action not in action_list:
+                if round == "red":
+                    text = "Red timeout, Black wins!" if action == "Timed out" else "Red moves illegally, Black wins!"
+                    winner = "black"
+                    break
+
+                elif round == "black":
+                    text = "Black timeout, Red wins!" if action == "Timed out" else "Black moves illegally, Red wins!"
+                    winner = "red"
+                    break
+
+            # Record game state and change game state
+            action_history = (action[0], action[1], action[2],
+                              action[3], board[action[2]][action[3]])
+            history.append(action_history)
+            if scores is not None:
+                scores.append(None if timeout else getattr(red if round == "red" else black, "search_value", None))
+
+            # Take action
+            board[action[2]][action[3]] = board[action[0]][action[1]]
+            board[action[0]][action[1]] = 0
+
+            if action_history[4] != 0:  # Refresh the record when some piece is eaten
+                step = 0
+            else:
+                step += 1
+                if step == 120:    # Draw
+                    text = "Both sides have not eaten in sixty rounds, draw!"
+                    winner = "draw"
+                    break
+
+            round = change_round(round)
+    finally:
+        if workers is not None:
+            for worker in workers.values():
+                worker.close()
 
     return winner, text, history
 
@@ -107,7 +143,7 @@ def get_player_action_with_timeout(board, player):
         target=get_player_action, args=(board, player, result_queue))
     p.start()
     # Reserve time (here is 0.5 seconds) to start the process
-    p.join(timeout=10 + 0.5)
+    p.join(timeout=TIME_LIMIT + TIME_RESERVE)
 
     if p.is_alive():    # If the process is still running, it indicates a timeout
 
@@ -119,3 +155,94 @@ def get_player_action_with_timeout(board, player):
         result = result_queue.get()  # Get the return result of the function from the queue
 
     return result
+
+
+# Serve the moves of one player in a long-lived process, until None is received, then let the player free its resources
+def serve_player_actions(player, connection):
+
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        board, history = request
+        player.update_history(history)
+        try:
+            action = player.policy(board)
+        except Exception as e:
+            print(f"Exception occurred in {player.get_name()}: {e}")
+            action = None   # Judged as an illegal move
+        connection.send(action)
+    connection.close()
+    close = getattr(player, "close", None)   # e.g. the shared transposition table of Player 7
+    if close is not None:
+        close()
+
+
+class PlayerWorker:
+    """
+    A player living in its own worker process for a whole game, asked for its moves over a pipe.
+
+    The player is pickled once, when the worker starts, and keeps its state from one move to the next.
+    The thinking time is measured by the caller; a worker whose player overruns it is killed, and every
+    later request answers "Timed out". The worker is not a daemon process, so that its player may start
+    processes of its own (e.g. the parallel search of Player 7); close must be called after the game.
+
+    Args:
+        - player: an instance of the Player class.
+        - time_limit: the time allowed for a move, in seconds.
+    """
+
+    def __init__(self, player, time_limit: float = TIME_LIMIT + TIME_RESERVE):
+
+        self.time_limit = time_limit
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=serve_player_actions, args=(player, child_connection))
+        self.process.start()
+        child_connection.close()
+        self.alive = True
+
+    def get_action(self, board, history):
+        """
+        Ask the player for its action on board after history.
+
+        Returns:
+            - action: the action of the player, "Timed out" on an overrun, or None if the worker failed.
+        """
+
+        if not self.alive:
+            return "Timed out"
+        try:
+            self.connection.send((board, history))
+            if not self.connection.poll(self.time_limit):
+                self.kill()
+                return "Timed out"
+            return self.connection.recv()
+        except (EOFError, OSError):
+            self.kill()
+            return None
+
+    def kill(self):
+        self.alive = False
+        self.process.terminate()
+        self.process.join()
+        self.connection.close()
+
+    def close(self):
+        """Stop the worker after the game."""
+
+        if not self.alive:
+            return
+        self.alive = False
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
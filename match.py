@@ -0,0 +1,234 @@
+import os
+import math
+import argparse
+import importlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from headless_game import play_headless_game
+from tournament import silence_players
+from utils import init_board, get_legal_actions, change_round
+
+# Fixed opening lines, red first, each played twice with the engines swapping sides
+OPENINGS = (
+    ((7, 7, 7, 4), (0, 7, 2, 6)),   # Central cannon against screen horse
+    ((7, 7, 7, 4), (2, 7, 2, 4)),   # Central cannon against same direction cannon
+    ((7, 7, 7, 4), (2, 1, 2, 4)),   # Central cannon against opposite direction cannon
+    ((7, 1, 7, 4), (0, 2, 2, 4)),   # Central cannon against elephant
+    ((7, 1, 7, 5), (0, 7, 2, 6)),   # Cross palace cannon
+    ((9, 2, 7, 4), (3, 6, 4, 6)),   # Elephant opening
+    ((6, 6, 5, 6), (0, 1, 2, 2)),   # Pawn opening
+    ((9, 1, 7, 2), (3, 2, 4, 2)),   # Horse opening
+)
+
+PSEUDO_GAMES = 1        # wins, draws and losses added to the results when estimating the score variance
+SPRT_MIN_GAMES = 16     # games before the SPRT may decide: every opening played with both sides
+
+
+def load_engine(spec: str):
+    """The Player class of an engine: a group id such as "7", or a module path such as "player_7.player_7"."""
+
+    module_name = f"player_{spec}.player_{spec}" if spec.isdigit() else spec
+    return importlib.import_module(module_name).Player
+
+
+def check_openings(openings=OPENINGS):
+    """Raise ValueError if an opening line contains an illegal action."""
+
+    for index, opening in enumerate(openings):
+        board = init_board()
+        side = "red"
+        history = []
+        for action in opening:
+            if tuple(action) not in get_legal_actions(board, side, history):
+                raise ValueError(f"opening {index} plays the illegal action {action}")
+            history.append((action[0], action[1], action[2], action[3], board[action[2]][action[3]]))
+            board[action[2]][action[3]] = board[action[0]][action[1]]
+            board[action[0]][action[1]] = 0
+            side = change_round(side)
+
+
+def score_to_elo(score: float):
+    """The Elo difference expected to give score (0~1) per game."""
+
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_to_score(elo: float):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def _score_variance(wins, draws, losses):
+    # Mean score per game, and its variance with PSEUDO_GAMES of every result added, so that a short
+    # one-sided run is not taken for a score known without error
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    wins, draws, losses = wins + PSEUDO_GAMES, draws + PSEUDO_GAMES, losses + PSEUDO_GAMES
+    total = wins + draws + losses
+    mean = (wins + draws / 2) / total
+    variance = (wins * (1 - mean) ** 2 + draws * (0.5 - mean) ** 2 + losses * mean ** 2) / total
+    return score, variance
+
+
+def elo_estimate(wins: int, draws: int, losses: int):
+    """
+    Estimate the Elo difference from the results of the first engine.
+
+    Returns:
+        - elo, error: the estimate and the half width of its 95% confidence interval (inf when unknown).
+    """
+
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, float('inf')
+    score, variance = _score_variance(wins, draws, losses)
+    margin = 1.96 * math.sqrt(variance / games)
+    low = score_to_elo(score - margin)
+    high = score_to_elo(score + margin)
+    return score_to_elo(score), (high - low) / 2
+
+
+def sprt_llr(wins: int, draws: int, losses: int, elo0: float, elo1: float):
+    """
+    Log-likelihood ratio of H1 (the first engine is elo1 stronger) against H0 (elo0 stronger), in the
+    normal approximation of the per game score.
+    """
+
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0
+    score, variance = _score_variance(wins, draws, losses)
+    score0 = elo_to_score(elo0)
+    score1 = elo_to_score(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(alpha: float, beta: float):
+    """The (lower, upper) LLR bounds of an SPRT with false positive rate alpha and false negative rate beta."""
+
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def sprt_decision(wins: int, draws: int, losses: int, elo0: float, elo1: float, alpha: float, beta: float,
+                  min_games: int = SPRT_MIN_GAMES):
+    """The hypothesis accepted by the SPRT after these results, "H0" or "H1", or None to go on playing."""
+
+    if wins + draws + losses < min_games:
+        return None
+    lower, upper = sprt_bounds(alpha, beta)
+    llr = sprt_llr(wins, draws, losses, elo0, elo1)
+    if llr >= upper:
+        return "H1"
+    if llr <= lower:
+        return "H0"
+    return None
+
+
+def play_match_game(engine_a: str, engine_b: str, opening: int, side_a: str, timeout: bool = True,
+                    persistent: bool = False):
+    """
+    Play one game of a match in a worker of the pool.
+
+    Returns:
+        - (opening, side_a, score, text): score is 1, 0.5 or 0 for engine_a, or None if the game failed.
+    """
+
+    try:
+        player_a = load_engine(engine_a)(side_a)
+        player_b = load_engine(engine_b)("black" if side_a == "red" else "red")
+        red, black = (player_a, player_b) if side_a == "red" else (player_b, player_a)
+        winner, text, _ = play_headless_game(red, black, timeout, persistent, list(OPENINGS[opening]))
+    except Exception as e:
+        return opening, side_a, None, str(e)
+    score = 0.5 if winner == "draw" else (1 if winner == side_a else 0)
+    return opening, side_a, score, text
+
+
+def run_match(engine_a: str, engine_b: str, pairs: int = 100, sprt: bool = False, elo0: float = 0,
+              elo1: float = 10, alpha: float = 0.05, beta: float = 0.05, workers: int = None,
+              timeout: bool = True, persistent: bool = False):
+    """
+    Play paired games between two engines and estimate their Elo difference, optionally stopping early.
+
+    Every pair plays one opening of OPENINGS twice, with the engines swapping sides, going round the
+    openings. Games run in parallel, and a line is printed as each one finishes.
+
+    Args:
+        - engine_a, engine_b: the engines, as taken by load_engine. Elo is that of engine_a over engine_b.
+        - pairs: the largest number of game pairs.
+        - sprt: stop as soon as the sequential probability ratio test of H0: elo = elo0 against H1: elo = elo1
+            accepts one of them, with error rates alpha and beta, once SPRT_MIN_GAMES games are played.
+            Games already started are still counted.
+        - workers: the size of the process pool, the number of cores by default.
+        - timeout, persistent: passed to play_headless_game.
+
+    Returns:
+        - result: a dict with wins, draws and losses of engine_a, elo, error, llr and the SPRT decision
+            ("H0", "H1" or None).
+    """
+
+    check_openings()
+    wins = draws = losses = failures = 0
+    lower, upper = sprt_bounds(alpha, beta)
+    decision = None
+    workers = workers or os.cpu_count()
+    games = [(pair % len(OPENINGS), side) for pair in range(pairs) for side in ("red", "black")]
+    next_game = 0
+    llr = 0.0
+    elo, error = 0.0, float('inf')
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=silence_players) as executor:
+        futures = set()
+        while futures or (next_game < len(games) and decision is None):
+            # Keep every worker busy without queueing games an early stop would throw away
+            while decision is None and next_game < len(games) and len(futures) < workers:
+                opening, side_a = games[next_game]
+                futures.add(executor.submit(play_match_game, engine_a, engine_b, opening, side_a, timeout,
+                                            persistent))
+                next_game += 1
+
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                opening, side_a, score, text = future.result()
+                if score is None:
+                    failures += 1
+                elif score == 1:
+                    wins += 1
+                elif score == 0:
+                    losses += 1
+                else:
+                    draws += 1
+                elo, error = elo_estimate(wins, draws, losses)
+                llr = sprt_llr(wins, draws, losses, elo0, elo1)
+                if sprt and decision is None:
+                    decision = sprt_decision(wins, draws, losses, elo0, elo1, alpha, beta)
+                print(f"Game {wins + draws + losses + failures}: opening {opening}, {engine_a} takes {side_a}: {text}"
+                      f" | +{wins} ={draws} -{losses}, Elo {elo:.1f} +/- {error:.1f}"
+                      + (f", LLR {llr:.2f} ({lower:.2f}, {upper:.2f})" if sprt else ""), flush=True)
+
+    print(f"{engine_a} vs {engine_b}: +{wins} ={draws} -{losses}, Elo {elo:.1f} +/- {error:.1f}")
+    if sprt:
+        print(f"SPRT [{elo0}, {elo1}]: " + {"H1": "H1 accepted, the change is an improvement",
+                                            "H0": "H0 accepted, the change is not an improvement",
+                                            None: "no decision"}[decision])
+    return {"wins": wins, "draws": draws, "losses": losses, "failures": failures, "elo": elo, "error": error,
+            "llr": llr, "decision": decision}
+
+
+if __name__ == "__main__":    # for Windows OS
+    parser = argparse.ArgumentParser(description="Play paired games between two engines and estimate Elo.")
+    parser.add_argument("engine_a", help='the tested engine: a group id such as "7" or a module path')
+    parser.add_argument("engine_b", help="the reference engine")
+    parser.add_argument("--pairs", type=int, default=100, help="largest number of game pairs")
+    parser.add_argument("--sprt", action="store_true", help="stop early under a sequential probability ratio test")
+    parser.add_argument("--elo0", type=float, default=0, help="Elo of H0")
+    parser.add_argument("--elo1", type=float, default=10, help="Elo of H1")
+    parser.add_argument("--alpha", type=float, default=0.05, help="false positive rate")
+    parser.add_argument("--beta", type=float, default=0.05, help="false negative rate")
+    parser.add_argument("--workers", type=int, help="size of the process pool (default: number of cores)")
+    parser.add_argument("--no-timeout", action="store_true", help="no limit on the thinking time")
+    parser.add_argument("--persistent", action="store_true", help="one worker process per player and game")
+    args = parser.parse_args()
+
+    run_match(args.engine_a, args.engine_b, args.pairs, args.sprt, args.elo0, args.elo1, args.alpha, args.beta,
+              args.workers, not args.no_timeout, args.persistent)
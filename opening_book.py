@@ -0,0 +1,176 @@
+import os
+import sys
+import csv
+import json
+import mmap
+import random
+import struct
+import argparse
+from array import array
+from bisect import bisect_left
+
+from utils import encode_move, move_to_action
+from zobrist import hash_board
+from external_sort import write_columns
+
+# The book shipped with the project, shared by every player and engine process
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+# File layout, all little-endian:
+#   header   magic, version and number of entries n, padded to 16 bytes
+#   keys     n × uint64, the Zobrist hash (zobrist.hash_board, side to move included) of each entry, sorted
+#   moves    n × uint32, the action of each entry packed by utils.encode_move
+#   weights  n × uint32, how often the action was played from that position
+# A position with several book moves has one entry per move, next to each other.
+MAGIC = b"ACBK"
+VERSION = 1
+_HEADER = struct.Struct("<4sII4x")
+
+
+class OpeningBook:
+    """
+    A read-only opening book file, memory-mapped and probed by binary search over its sorted keys.
+
+    Nothing is parsed when the book is opened, and every process mapping the same file shares its pages
+    through the page cache.
+
+    Args:
+        - path: the book file, written by write_book.
+    """
+
+    def __init__(self, path: str = BOOK_PATH):
+
+        self.path = path
+        with open(path, "rb") as book_file:
+            self._map = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not an opening book of version {VERSION}")
+        if len(self._map) != _HEADER.size + 16 * count:
+            self._map.close()
+            raise ValueError(f"{path} is truncated")
+
+        self.count = count
+        keys_end = _HEADER.size + 8 * count
+        moves_end = keys_end + 4 * count
+        if sys.byteorder == "little":
+            view = memoryview(self._map)
+            self.keys = view[_HEADER.size:keys_end].cast("Q")
+            self.moves = view[keys_end:moves_end].cast("I")
+            self.weights = view[moves_end:].cast("I")
+        else:
+            # A big-endian machine reads a byte-swapped copy instead of the mapping
+            self.keys = array("Q", self._map[_HEADER.size:keys_end])
+            self.moves = array("I", self._map[keys_end:moves_end])
+            self.weights = array("I", self._map[moves_end:])
+            for column in (self.keys, self.moves, self.weights):
+                column.byteswap()
+
+    def __len__(self):
+        return self.count
+
+    def probe(self, key: int):
+        """
+        Look a position up.
+
+        Returns:
+            - entries: a list of (action, weight) for every book move of the position, empty on a miss.
+        """
+
+        keys = self.keys
+        index = bisect_left(keys, key)
+        entries = []
+        while index < self.count and keys[index] == key:
+            entries.append((move_to_action(self.moves[index]), self.weights[index]))
+            index += 1
+        return entries
+
+    def choose(self, key: int, rng=random):
+        """Pick one book move of a position at random, in proportion to the weights. None on a miss."""
+
+        entries = self.probe(key)
+        if not entries:
+            return None
+        return rng.choices([action for action, _ in entries], weights=[weight for _, weight in entries])[0]
+
+    def close(self):
+        if isinstance(self.keys, memoryview):
+            self.keys.release()
+            self.moves.release()
+            self.weights.release()
+        self._map.close()
+
+
+def write_book(path: str, entries):
+    """
+    Write an opening book file.
+
+    Args:
+        - path: the file to write. It is replaced atomically, so running engines keep their old mapping.
+        - entries: an iterable of (key, move, weight), with move packed by utils.encode_move. Entries repeating
+            the same key and move are merged by adding their weights.
+
+    Returns:
+        - count: the number of entries written.
+    """
+
+    merged = {}
+    for key, move, weight in entries:
+        merged[(key, move)] = merged.get((key, move), 0) + weight
+    return write_sorted_book(path, ((key, move, weight) for (key, move), weight in sorted(merged.items())))
+
+
+def write_sorted_book(path: str, entries):
+    """
+    Write an opening book file from entries already sorted by (key, move) and unique, without holding them
+    in memory.
+
+    Returns:
+        - count: the number of entries written.
+    """
+
+    return write_columns(path, lambda count: _HEADER.pack(MAGIC, VERSION, count),
+                         ((key, move, min(weight, 0xFFFFFFFF)) for key, move, weight in entries), ("Q", "I", "I"))
+
+
+def read_csv_book(path: str):
+    """
+    Read the CSV book of the old builder: a header row, then rows of a board as JSON and the action played
+    from it as a JSON five-element list (old_x, old_y, new_x, new_y, eaten_id).
+
+    Yields:
+        - (key, move, 1) for every row, the side to move being the side of the moved piece.
+    """
+
+    with open(path, "r", newline="") as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)
+        for row in reader:
+            # Rows whose action was saved as a Python tuple repr are unreadable, as before
+            if "tuple" in row[1]:
+                continue
+            board = json.loads(row[0])
+            old_x, old_y, new_x, new_y = json.loads(row[1])[:4]
+            side = "red" if board[old_x][old_y] > 0 else "black"
+            yield hash_board(board, side), encode_move(old_x, old_y, new_x, new_y), 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect a binary opening book.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="convert CSV books (board, action rows) into a book file")
+    build_parser.add_argument("csv", nargs="+", help="CSV files written by the old opening book builder")
+    build_parser.add_argument("-o", "--output", default=BOOK_PATH, help="the book file to write")
+    info_parser = subparsers.add_parser("info", help="print the size of a book file")
+    info_parser.add_argument("book", nargs="?", default=BOOK_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = write_book(args.output, (entry for path in args.csv for entry in read_csv_book(path)))
+        print(f"{args.output}: {count} entries")
+    else:
+        book = OpeningBook(args.book)
+        positions = sum(1 for index in range(len(book)) if index == 0 or book.keys[index] != book.keys[index - 1])
+        print(f"{args.book}: {len(book)} entries, {positions} positions")
+        book.close()
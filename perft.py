@@ -0,0 +1,192 @@
+import time
+import argparse
+
+from utils import get_legal_actions, change_round
+
+
+# Named test positions: (board rows, side to move), copied into a fresh board for every run
+POSITIONS = {
+    # Initial position
+    "start": (((-6, -4, -3, -2, -7, -2, -3, -4, -6),
+               (0, 0, 0, 0, 0, 0, 0, 0, 0),
+               (0, -5, 0, 0, 0, 0, 0, -5, 0),
+               (-1, 0, -1, 0, -1, 0, -1, 0, -1),
+               (0, 0, 0, 0, 0, 0, 0, 0, 0),
+               (0, 0, 0, 0, 0, 0, 0, 0, 0),
+               (1, 0, 1, 0, 1, 0, 1, 0, 1),
+               (0, 5, 0, 0, 0, 0, 0, 5, 0),
+               (0, 0, 0, 0, 0, 0, 0, 0, 0),
+               (6, 4, 3, 2, 7, 2, 3, 4, 6)), "red"),
+    # "Player 1 VS Player 2/Game 1.txt" after 24 plies
+    "opening": (((-6, 0, -3, -2, -7, -2, -3, 0, -6),
+                 (0, 0, 0, 0, 0, 0, 0, 0, 0),
+                 (-4, 0, 0, 0, 0, 0, 0, 0, -4),
+                 (-1, 0, 0, 0, -1, 0, -1, 0, -1),
+                 (-5, 0, -1, 0, 0, 0, 0, 0, 0),
+                 (0, 0, 1, 0, 0, 0, 0, 5, 1),
+                 (0, 0, 0, 0, 0, 0, 1, 0, 0),
+                 (0, 0, 4, 0, 0, 0, 0, 0, 5),
+                 (0, 0, 0, 0, 0, 0, 0, 0, 0),
+                 (6, 0, 3, 2, 7, 2, 3, 4, 6)), "red"),
+    # "Player 2 VS Player 3/Game 1.txt" after 29 plies, black is in check
+    "check": (((-6, 0, -3, 0, -7, -2, 0, 0, 0),
+               (0, 0, 0, 0, 0, 0, 0, 0, 0),
+               (-4, 0, 0, -2, -3, 0, -4, 0, -6),
+               (-1, 0, 0, 1, 0, 0, -1, 0, -1),
+               (0, 0, -1, 0, 0, 0, 0, 0, 0),
+               (0, 0, 0, 0, 0, -5, -5, 0, 0),
+               (1, 0, 1, 0, 0, 0, 1, 0, 1),
+               (0, 0, 0, 0, 5, 0, 0, 0, 4),
+               (6, 0, 0, 5, 2, 6, 0, 0, 0),
+               (0, 4, 3, 0, 7, 2, 3, 0, 0)), "black"),
+    # "Player 2 VS Player 3/Game 2.txt" after 60 plies
+    "middlegame": (((-6, 0, 0, -2, -7, 0, -3, -4, 0),
+                    (0, 0, -6, -4, 0, 0, 0, 0, 0),
+                    (0, 0, 0, 0, -3, -2, 0, 0, 0),
+                    (-1, 0, 0, 0, 0, 0, -1, -5, -1),
+                    (0, 0, -1, 0, 1, 0, 0, 0, 0),
+                    (1, 0, 0, 0, 0, 5, 3, 0, 1),
+                    (0, 0, 1, 0, 0, 0, 1, 0, 0),
+                    (0, 0, 0, 0, 3, 0, 4, 0, 0),
+                    (0, 0, 0, 0, 2, 7, 5, 0, 0),
+                    (4, -5, 6, 2, 0, 0, 0, 0, 6)), "red"),
+    # "Player 1 VS Player 3/Game 3.txt" after 100 plies
+    "late": (((0, -4, 0, 0, 0, -2, 0, 0, 0),
+              (0, 0, 0, 0, 0, -7, 0, 0, 0),
+              (-6, 0, 0, 0, 0, -2, 0, 0, -3),
+              (0, 0, 0, 0, 0, -6, 0, 0, 0),
+              (-1, 0, -3, 0, 0, 0, -1, 0, 0),
+              (0, 0, 0, 0, -1, 4, 3, 0, 1),
+              (1, 0, 1, 0, 0, 0, 0, 0, 0),
+              (4, 5, 0, 0, 0, 0, 0, 0, 0),
+              (0, 0, 0, 7, -5, 0, 0, 0, 0),
+              (0, -5, 3, 2, 0, 2, 6, 0, 0)), "red"),
+    # Chariot, Horse and Cannon against a lone Advisor and Pawn
+    "endgame": (((0, 0, 0, 0, -7, 0, 0, 0, 0),
+                 (0, 0, 0, 0, -2, 0, 0, 0, 0),
+                 (6, 0, 0, 0, 0, 0, 0, 0, 0),
+                 (0, 0, 0, 0, 0, 0, 0, 0, 0),
+                 (0, 0, 0, 0, 0, 0, 4, 0, 0),
+                 (0, 0, 0, 0, 0, 0, 0, 0, 0),
+                 (0, 0, 0, -1, 0, 0, 0, 0, 0),
+                 (0, 0, 5, 0, 0, 0, 0, 0, 0),
+                 (0, 0, 0, 0, 0, 0, 0, 0, 0),
+                 (0, 0, 0, 7, 0, 0, 0, 0, 0)), "red"),
+}
+
+# Leaf counts at depth 1, 2, 3, ... from each position with an empty history,
+# produced by the original rule()-based get_legal_actions
+REFERENCE = {
+    "start": (44, 1920, 79666, 3290240),
+    "opening": (44, 955, 41858, 1028099),
+    "check": (8, 358, 11347, 482440),
+    "middlegame": (38, 1539, 55742, 2313143),
+    "late": (33, 1256, 37304, 1461621),
+    "endgame": (44, 368, 14344, 95197, 3468785),
+}
+
+
+def get_position(name):
+    """Return a fresh (board, side) for a named test position."""
+
+    rows, side = POSITIONS[name]
+    return tuple(list(row) for row in rows), side
+
+
+def perft(board: tuple, side: str, history: list, depth: int):
+    """
+    Count the leaf nodes of the tree of legal actions.
+
+    Args:
+        - board, side, history: the position, as taken by get_legal_actions. board and history are restored
+            before returning.
+        - depth: the number of plies to expand.
+
+    Returns:
+        - nodes: the number of action sequences of length depth.
+    """
+
+    action_list = get_legal_actions(board, side, history)
+    if depth == 1:
+        return len(action_list)
+
+    nodes = 0
+    next_side = change_round(side)
+    for old_x, old_y, new_x, new_y in action_list:
+        eaten_id = board[new_x][new_y]
+        board[new_x][new_y] = board[old_x][old_y]
+        board[old_x][old_y] = 0
+        history.append((old_x, old_y, new_x, new_y, eaten_id))
+
+        nodes += perft(board, next_side, history, depth - 1)
+
+        history.pop()
+        board[old_x][old_y] = board[new_x][new_y]
+        board[new_x][new_y] = eaten_id
+    return nodes
+
+
+def divide(board: tuple, side: str, history: list, depth: int):
+    """Return {action: leaf count below it} for every legal root action, to locate a wrong count."""
+
+    result = {}
+    next_side = change_round(side)
+    for action in get_legal_actions(board, side, history):
+        old_x, old_y, new_x, new_y = action
+        eaten_id = board[new_x][new_y]
+        board[new_x][new_y] = board[old_x][old_y]
+        board[old_x][old_y] = 0
+        history.append((old_x, old_y, new_x, new_y, eaten_id))
+
+        result[action] = perft(board, next_side, history, depth - 1) if depth > 1 else 1
+
+        history.pop()
+        board[old_x][old_y] = board[new_x][new_y]
+        board[new_x][new_y] = eaten_id
+    return result
+
+
+def run_perft(name: str, depth: int, show_divide: bool = False):
+    """
+    Run perft on a named position, print the node count and speed, and compare with the reference count.
+
+    Returns:
+        - ok: False if a reference count for this depth exists and differs, True otherwise.
+    """
+
+    board, side = get_position(name)
+    start_time = time.time()
+    if show_divide:
+        result = divide(board, side, [], depth)
+        for action, count in result.items():
+            print(f"    {action}: {count}")
+        nodes = sum(result.values())
+    else:
+        nodes = perft(board, side, [], depth)
+    elapsed = time.time() - start_time
+
+    reference = REFERENCE[name]
+    expected = reference[depth - 1] if depth <= len(reference) else None
+    ok = expected is None or nodes == expected
+    status = "no reference" if expected is None else ("ok" if ok else f"MISMATCH, expected {expected}")
+    print(f"{name:<12} depth {depth}: {nodes:>10} nodes  {elapsed:8.2f} s  "
+          f"{nodes / max(elapsed, 1e-9):>10.0f} nodes/s  {status}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count and time the legal action tree of test positions.")
+    parser.add_argument("--position", choices=sorted(POSITIONS), help="a single position (default: all)")
+    parser.add_argument("--depth", type=int, help="a single depth (default: every reference depth up to --max-depth)")
+    parser.add_argument("--max-depth", type=int, default=3, help="deepest reference depth checked by default")
+    parser.add_argument("--divide", action="store_true", help="print the count below every root action")
+    args = parser.parse_args()
+
+    names = [args.position] if args.position else list(POSITIONS)
+    all_ok = True
+    for name in names:
+        depths = [args.depth] if args.depth else range(1, min(len(REFERENCE[name]), args.max_depth) + 1)
+        for depth in depths:
+            all_ok = run_perft(name, depth, args.divide) and all_ok
+    if not all_ok:
+        raise SystemExit(1)
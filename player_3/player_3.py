@@ -1,6 +1,7 @@
 import random
 
 from utils import get_legal_actions
+from search import quiescence
 # import xxx    # Here may be other package you want to import
 
 
@@ -58,7 +59,7 @@ class Player():  # please do not change the class name
                 for enemy_action in enemy_actions:
                     self.move(
                         board, enemy_action[0], enemy_action[1], enemy_action[2], enemy_action[3])
-                    value = self.get_value(board)
+                    value = quiescence(self, board, max_value, min_enemy_value, 'red')
                     if value < min_enemy_value:
                         min_enemy_value = value
                     self.move_back(
@@ -77,7 +78,7 @@ class Player():  # please do not change the class name
                 for enemy_action in enemy_actions:
                     self.move(
                         board, enemy_action[0], enemy_action[1], enemy_action[2], enemy_action[3])
-                    value = self.get_value(board)
+                    value = quiescence(self, board, max_enemy_value, min_value, 'black')
                     if value > max_enemy_value:
                         max_enemy_value = value
                     self.move_back(
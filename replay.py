@@ -1,10 +1,10 @@
 import os
-import ast
 import sys
 
 from PyQt5.QtWidgets import QApplication
 
 from game import Replay
+from archive import ARCHIVE_PATH, GameArchive, parse_history_text
 
 
 def read_history(player_1, player_2, game):  # Read histroy from txt files
@@ -20,6 +20,13 @@ def read_history(player_1, player_2, game):  # Read histroy from txt files
     folder_name = f"Player {player_1} VS Player {player_2}"
     file_name = f"Game {game}.txt"
 
+    # Look the game up in the archive first
+    if os.path.exists(ARCHIVE_PATH):
+        with GameArchive(ARCHIVE_PATH) as archive:
+            index = archive.find(f"{folder_name}/Game {game}")
+            if index is not None:
+                return archive[index].history
+
     directory = os.path.join(current_path, folder_name)
     file_path = os.path.join(directory, file_name)
 
@@ -27,7 +34,7 @@ def read_history(player_1, player_2, game):  # Read histroy from txt files
         history = f.readline()
 
     # Parse a list in string form into an available list
-    history = ast.literal_eval(history)
+    history = parse_history_text(history)
 
     return history
 
@@ -0,0 +1,279 @@
+from utils import get_legal_actions, get_capture_actions, get_King_location, is_King_attacked, is_legal_action, \
+    change_round, get_check_record, static_exchange, PIECE_VALUE, POSITION_VALUE
+
+POSITION_WEIGHT = 8     # weight of the position value in get_value of the players
+
+# A capture is skipped when even winning the eaten piece for free, plus this margin for the position value
+# gained by the moving piece, can not lift the static value up to the window (delta pruning).
+# No single step gains more than 40 position value in the tables.
+DELTA_MARGIN = POSITION_WEIGHT * 40
+
+# Plies below a leaf of minimax after which quiescence returns the static value, in check or not, since a
+# sequence of checks may go on for long
+QUIESCENCE_MAX_PLY = 12
+
+# A side without chariot and with at most this many horses and cannons may be in zugzwang, where passing would
+# be better than any action, so a null move can not be trusted to prove a cutoff there.
+ZUGZWANG_PIECES = 2
+
+
+def zugzwang_prone(board, side):
+    """Whether side is in an endgame where it may have no good action: no chariot and few horses and cannons."""
+
+    sign = 1 if side == 'red' else -1
+    pieces = 0
+    for row in board:
+        for piece_id in row:
+            piece_id *= sign
+            if piece_id == 6:
+                return False
+            if piece_id in (4, 5):
+                pieces += 1
+    return pieces <= ZUGZWANG_PIECES
+
+
+def order_captures(board, action_list):
+    """Sort captures by most valuable victim first, then least valuable attacker (MVV-LVA)."""
+
+    return sorted(action_list, key=lambda action: (-abs(PIECE_VALUE[board[action[2]][action[3]]]),
+                                                   abs(PIECE_VALUE[board[action[0]][action[1]]])))
+
+
+def losing_capture(board, action):
+    """Whether the capture action loses material once the exchange on its square settles (utils.static_exchange)."""
+
+    # Eating a piece worth at least the moving one can not lose material, whatever follows
+    if abs(PIECE_VALUE[board[action[2]][action[3]]]) >= abs(PIECE_VALUE[board[action[0]][action[1]]]):
+        return False
+    return static_exchange(board, action) < 0
+
+
+def eaten_value(board, action):
+    """The signed value, material and position, that the piece eaten by action takes off the board."""
+
+    eaten_id = board[action[2]][action[3]]
+    return PIECE_VALUE[eaten_id] + POSITION_WEIGHT * POSITION_VALUE[eaten_id][action[2] * 9 + action[3]]
+
+
+def quiescence(player, board, alpha, beta, side, delta_margin=DELTA_MARGIN, prune_losing=True, ply=0,
+               max_ply=QUIESCENCE_MAX_PLY):
+    """
+    Search only captures below a leaf of minimax, so that the leaf is not valued in the middle of an exchange.
+
+    The side to move may stand pat on the static value of player.get_value, since it is never forced to
+    capture, unless its King is in check: then every legal action is searched and no action means a loss.
+    Out of check, captures losing material by static exchange evaluation are not searched, nor captures
+    forbidden by the perpetual check rule. Values are seen from the red side, as in minimax, and may fall
+    outside (alpha, beta) (fail-soft).
+
+    Args:
+        - player: the Player searching, whose move, move_back and get_value are used. If it has a time_up method,
+            it is called at every node, and returns True once the time of the move is used up, or raises to stop
+            the search.
+        - board, side: the position to value, and the side to move.
+        - alpha, beta: the search window.
+        - delta_margin: the margin of delta pruning.
+        - prune_losing: skip the captures that lose material by static exchange evaluation.
+        - ply, max_ply: the plies searched below the leaf, and the number of plies after which the static value
+            is returned.
+
+    Returns:
+        - value: the value of the position after the capture sequence settles.
+    """
+
+    King = get_King_location(board, side)
+    time_up = getattr(player, "time_up", None)
+    if King is None or ply >= max_ply or (time_up is not None and time_up()):
+        return player.get_value(board)
+
+    next_side = change_round(side)
+    if is_King_attacked(board, King[0], King[1]):
+        legal_cache = getattr(player, "legal_cache", None)
+        if legal_cache is not None:
+            action_list = legal_cache.get_legal_actions(board, side, player.history, player.board_hash)
+        else:
+            action_list = get_legal_actions(board, side, player.history)
+        if side == 'red':
+            value = float('-inf')
+            for action in action_list:
+                player.move(board, action[0], action[1], action[2], action[3])
+                value = max(value, quiescence(player, board, alpha, beta, next_side, delta_margin, prune_losing,
+                                              ply + 1, max_ply))
+                player.move_back(board, action[0], action[1], action[2], action[3])
+                alpha = max(alpha, value)
+                if beta <= alpha:
+                    break
+        else:
+            value = float('inf')
+            for action in action_list:
+                player.move(board, action[0], action[1], action[2], action[3])
+                value = min(value, quiescence(player, board, alpha, beta, next_side, delta_margin, prune_losing,
+                                              ply + 1, max_ply))
+                player.move_back(board, action[0], action[1], action[2], action[3])
+                beta = min(beta, value)
+                if beta <= alpha:
+                    break
+        return value
+
+    stand_pat = player.get_value(board)
+    if side == 'red':
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        value = stand_pat
+        check_record = get_check_record(board, player.history)
+        for action in order_captures(board, get_capture_actions(board, side)):
+            if stand_pat - eaten_value(board, action) + delta_margin <= alpha:
+                continue
+            if prune_losing and losing_capture(board, action):
+                continue
+            if check_record is not None and check_record.is_perpetual(board, action):
+                continue
+            player.move(board, action[0], action[1], action[2], action[3])
+            value = max(value, quiescence(player, board, alpha, beta, next_side, delta_margin, prune_losing,
+                                          ply + 1, max_ply))
+            player.move_back(board, action[0], action[1], action[2], action[3])
+            alpha = max(alpha, value)
+            if beta <= alpha:
+                break
+    else:
+        if stand_pat <= alpha:
+            return stand_pat
+        beta = min(beta, stand_pat)
+        value = stand_pat
+        check_record = get_check_record(board, player.history)
+        for action in order_captures(board, get_capture_actions(board, side)):
+            if stand_pat - eaten_value(board, action) - delta_margin >= beta:
+                continue
+            if prune_losing and losing_capture(board, action):
+                continue
+            if check_record is not None and check_record.is_perpetual(board, action):
+                continue
+            player.move(board, action[0], action[1], action[2], action[3])
+            value = min(value, quiescence(player, board, alpha, beta, next_side, delta_margin, prune_losing,
+                                          ply + 1, max_ply))
+            player.move_back(board, action[0], action[1], action[2], action[3])
+            beta = min(beta, value)
+            if beta <= alpha:
+                break
+    return value
+
+
+# Stages of MoveOrderer.actions
+HASH, CAPTURES, KILLERS, COUNTERMOVE, LOSING_CAPTURES, QUIETS = range(6)
+MAX_PLY = 64            # plies from the root that have killers
+HISTORY_LIMIT = 1 << 20  # history scores are halved when one of them grows past this
+
+
+class MoveOrderer:
+    """
+    The move ordering state of one searching player, and the staged, lazy ordering of the actions of a node.
+
+    The actions of a node come in stages: the hash actions (the transposition table action, and the best
+    action of the previous iteration at the root), the captures that do not lose material by static exchange
+    evaluation, by MVV-LVA, the two killers of the ply, the countermove of the previous action, the losing
+    captures, and the remaining quiet actions by butterfly history score. A stage is only built when the search reaches it,
+    so a cutoff by the hash action or a capture never generates the quiet actions.
+
+    Variables:
+        - self.killers: for every ply from the root, the last two quiet actions that caused a cutoff.
+        - self.countermoves: for every previous action (old square * 90 + new square), the quiet action that
+            last refuted it.
+        - self.history: for red and black, a score per (old square, new square), raised by depth² on every
+            cutoff of a quiet action and halved between searches.
+    """
+
+    def __init__(self):
+
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.countermoves = [None] * 8100
+        self.history = {'red': [0] * 8100, 'black': [0] * 8100}
+
+    def new_search(self):
+        """Forget the killers and age the history scores before the search of a new move."""
+
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.age_history()
+
+    def age_history(self):
+        for side in ('red', 'black'):
+            self.history[side] = [score >> 1 for score in self.history[side]]
+
+    def actions(self, board, side, ply, hash_actions, previous, generate, check_record=None):
+        """
+        Yield the legal actions of side, best first, each once. board must be back to the node position
+        whenever the next action is asked for.
+
+        Args:
+            - ply: the distance to the root, for the killers.
+            - hash_actions: actions to try first if they are legal, None entries being skipped.
+            - previous: the last action played, for the countermove, or None.
+            - generate: a function returning all legal actions, called only for the last stage.
+            - check_record: the CheckRecord of the history (utils.get_check_record), to test the actions of the
+                early stages against the perpetual check rule.
+
+        Yields:
+            - (stage, action)
+        """
+
+        searched = []
+        for action in hash_actions:
+            if action is not None and action not in searched and is_legal_action(board, side, action, check_record):
+                searched.append(action)
+                yield HASH, action
+
+        # Captures by MVV-LVA. Static exchange evaluation is only run when the victim is worth less than the
+        # attacker, and the captures it finds losing wait for their own stage, by smallest loss
+        captures = [action for action in get_capture_actions(board, side) if action not in searched
+                    and (check_record is None or not check_record.is_perpetual(board, action))]
+        losing = []
+        for action in order_captures(board, captures):
+            if abs(PIECE_VALUE[board[action[2]][action[3]]]) < abs(PIECE_VALUE[board[action[0]][action[1]]]):
+                gain = static_exchange(board, action)
+                if gain < 0:
+                    losing.append((-gain, action))
+                    continue
+            searched.append(action)
+            yield CAPTURES, action
+        losing.sort()
+
+        killers = self.killers[ply] if ply < MAX_PLY else ()
+        for action in killers:
+            if action is not None and action not in searched and board[action[2]][action[3]] == 0 \
+                    and is_legal_action(board, side, action, check_record):
+                searched.append(action)
+                yield KILLERS, action
+
+        if previous is not None:
+            action = self.countermoves[(previous[0] * 9 + previous[1]) * 90 + previous[2] * 9 + previous[3]]
+            if action is not None and action not in searched and board[action[2]][action[3]] == 0 \
+                    and is_legal_action(board, side, action, check_record):
+                searched.append(action)
+                yield COUNTERMOVE, action
+
+        for _, action in losing:
+            searched.append(action)
+            yield LOSING_CAPTURES, action
+
+        history = self.history[side]
+        quiets = [action for action in generate() if board[action[2]][action[3]] == 0 and action not in searched]
+        quiets.sort(key=lambda action: history[(action[0] * 9 + action[1]) * 90 + action[2] * 9 + action[3]],
+                    reverse=True)
+        for action in quiets:
+            yield QUIETS, action
+
+    def update(self, side, action, ply, depth, previous):
+        """Record that the quiet action of side caused a cutoff at ply with depth left, after previous."""
+
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if action != killers[0]:
+                killers[1] = killers[0]
+                killers[0] = action
+        if previous is not None:
+            self.countermoves[(previous[0] * 9 + previous[1]) * 90 + previous[2] * 9 + previous[3]] = action
+        history = self.history[side]
+        index = (action[0] * 9 + action[1]) * 90 + action[2] * 9 + action[3]
+        history[index] += depth * depth
+        if history[index] > HISTORY_LIMIT:
+            self.age_history()
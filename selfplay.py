@@ -0,0 +1,268 @@
+import os
+import zlib
+import random
+import struct
+import argparse
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from headless_game import play_headless_game
+from match import OPENINGS, load_engine
+from tournament import silence_players
+from utils import init_board, encode_move
+from zobrist import hash_board, move_key
+
+# File layout, all little-endian:
+#   header   magic and version, padded to 16 bytes
+#   chunks   a chunk header (number of records, length and CRC32 of the compressed data), then up to
+#            CHUNK_RECORDS records compressed together with zlib
+# A record is one position of a game and the action played from it:
+#   key      uint64, the Zobrist hash (zobrist.hash_board, side to move included) of the position
+#   board    90 × int8, the piece id on board[x][y] at x * 9 + y
+#   side     uint8, 0 when red is to move and 1 when black is
+#   ply      uint16, the number of actions played before the position
+#   move     uint32, the action played, packed by utils.encode_move as in the opening book
+#   score    int32, the search value of the action (red's view), ±MATE_SCORE for a forced result, NO_SCORE if unknown
+#   result   int8, the result of the game for red: 1 win, 0 draw, -1 loss
+MAGIC = b"ACSP"
+VERSION = 1
+_HEADER = struct.Struct("<4sI8x")
+_CHUNK_HEADER = struct.Struct("<III")
+_RECORD = struct.Struct("<Q90sBHIib")
+CHUNK_RECORDS = 4096
+MATE_SCORE = 2 ** 31 - 1
+NO_SCORE = -2 ** 31
+
+Position = namedtuple("Position", "key board side ply move score result")
+RESULTS = {"red": 1, "draw": 0, "black": -1}
+
+
+class SelfPlayWriter:
+    """
+    Append games to a self-play file, one compressed chunk at a time. An existing file is extended.
+
+    Args:
+        - path: the file to write.
+        - chunk_records: the number of records compressed together.
+        - level: the zlib compression level.
+    """
+
+    def __init__(self, path: str, chunk_records: int = CHUNK_RECORDS, level: int = 6):
+
+        self.path = path
+        self.chunk_records = chunk_records
+        self.level = level
+        self.buffer = bytearray()
+        self.pending = 0
+        self.games = 0
+        self.positions = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as data_file:
+                _check_header(data_file, path)
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "wb")
+            self.file.write(_HEADER.pack(MAGIC, VERSION))
+
+    def write_game(self, history, winner: str, scores=None):
+        """
+        Add every position of a game.
+
+        Args:
+            - history: the actions of the game from the initial position, four- or five-element tuples.
+            - winner: "red", "black" or "draw".
+            - scores: the search value of every action, as filled by play_headless_game, or None.
+        """
+
+        result = RESULTS[winner]
+        board = init_board()
+        side = "red"
+        board_hash = hash_board(board)
+        pack = _RECORD.pack
+        for ply, action in enumerate(history):
+            old_x, old_y, new_x, new_y = action[0], action[1], action[2], action[3]
+            piece_id = board[old_x][old_y]
+            eaten_id = board[new_x][new_y]
+            score = _pack_score(scores[ply] if scores is not None and ply < len(scores) else None)
+            cells = array('b', [cell for row in board for cell in row]).tobytes()
+            self.buffer += pack(board_hash, cells, 0 if side == "red" else 1, ply,
+                                encode_move(old_x, old_y, new_x, new_y), score, result)
+            self.pending += 1
+            if self.pending == self.chunk_records:
+                self.flush()
+
+            board_hash = move_key(board_hash, piece_id, old_x * 9 + old_y, new_x * 9 + new_y, eaten_id)
+            board[new_x][new_y] = piece_id
+            board[old_x][old_y] = 0
+            side = "black" if side == "red" else "red"
+        self.games += 1
+        self.positions += len(history)
+
+    def flush(self):
+        """Compress the buffered records into a chunk and write it."""
+
+        if not self.pending:
+            return
+        data = zlib.compress(bytes(self.buffer), self.level)
+        self.file.write(_CHUNK_HEADER.pack(self.pending, len(data), zlib.crc32(data)))
+        self.file.write(data)
+        self.file.flush()
+        self.buffer.clear()
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _check_header(data_file, path):
+    header = data_file.read(_HEADER.size)
+    if len(header) < _HEADER.size or _HEADER.unpack(header) != (MAGIC, VERSION):
+        raise ValueError(f"{path} is not a self-play file of version {VERSION}")
+
+
+def _pack_score(value):
+    if value is None:
+        return NO_SCORE
+    if value == float('inf'):
+        return MATE_SCORE
+    if value == float('-inf'):
+        return -MATE_SCORE
+    return min(max(int(round(value)), -MATE_SCORE + 1), MATE_SCORE - 1)
+
+
+def read_positions(path: str):
+    """
+    Stream the records of a self-play file, holding one chunk in memory at a time.
+
+    Yields:
+        - Position(key, board, side, ply, move, score, result): board is the 90 bytes of the record (see
+            unpack_board), side "red" or "black", and score None when unknown.
+    """
+
+    with open(path, "rb") as data_file:
+        _check_header(data_file, path)
+        while True:
+            chunk_header = data_file.read(_CHUNK_HEADER.size)
+            if not chunk_header:
+                return
+            if len(chunk_header) < _CHUNK_HEADER.size:
+                raise ValueError(f"{path} is truncated")
+            count, length, crc = _CHUNK_HEADER.unpack(chunk_header)
+            data = data_file.read(length)
+            if len(data) < length:
+                raise ValueError(f"{path} is truncated")
+            if zlib.crc32(data) != crc:
+                raise ValueError(f"{path} has a corrupted chunk")
+            for key, board, side, ply, move, score, result in _RECORD.iter_unpack(zlib.decompress(data)):
+                yield Position(key, board, "black" if side else "red", ply, move,
+                               None if score == NO_SCORE else score, result)
+
+
+def unpack_board(data: bytes):
+    """The 10×9 chessboard of a record, as a tuple of 10 lists like init_board."""
+
+    cells = array('b', data)
+    return tuple(cells[x * 9:x * 9 + 9].tolist() for x in range(10))
+
+
+def play_selfplay_game(engine_red: str, engine_black: str, opening: int = None):
+    """
+    Play one game without time limit in a worker of the pool, recording the search values.
+
+    Returns:
+        - (winner, text, history, scores), winner being None and text the exception when the game failed.
+    """
+
+    try:
+        red = load_engine(engine_red)("red")
+        black = load_engine(engine_black)("black")
+        scores = []
+        winner, text, history = play_headless_game(
+            red, black, False, False, None if opening is None else list(OPENINGS[opening]), scores)
+    except Exception as e:
+        return None, str(e), [], []
+    return winner, text, history, scores
+
+
+def run_selfplay(engines, games: int, output: str, workers: int = None, chunk_records: int = CHUNK_RECORDS):
+    """
+    Play games in parallel and append every position of them to a self-play file as they finish.
+
+    Each game starts from a random opening of match.OPENINGS, and with two engines they take random sides.
+
+    Args:
+        - engines: one engine (self-play) or two, as taken by match.load_engine.
+        - games: the number of games.
+        - output: the self-play file, extended if it exists.
+        - workers: the size of the process pool, the number of cores by default.
+
+    Returns:
+        - positions: the number of positions written.
+    """
+
+    workers = workers or os.cpu_count()
+    next_game = 0
+    finished = 0
+
+    with SelfPlayWriter(output, chunk_records) as writer, \
+            ProcessPoolExecutor(max_workers=workers, initializer=silence_players) as executor:
+        futures = set()
+        while futures or next_game < games:
+            while next_game < games and len(futures) < workers:
+                engine_red, engine_black = engines[0], engines[-1]
+                if random.random() < 0.5:
+                    engine_red, engine_black = engine_black, engine_red
+                futures.add(executor.submit(play_selfplay_game, engine_red, engine_black,
+                                            random.randrange(len(OPENINGS))))
+                next_game += 1
+
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                winner, text, history, scores = future.result()
+                finished += 1
+                if winner is None:
+                    print(f"Game {finished}: exception occurred: {text}", flush=True)
+                    continue
+                writer.write_game(history, winner, scores)
+                print(f"Game {finished}: {text} {len(history)} positions", flush=True)
+
+    print(f"{output}: {writer.positions} positions from {writer.games} games")
+    return writer.positions
+
+
+if __name__ == "__main__":    # for Windows OS
+    parser = argparse.ArgumentParser(description="Generate self-play positions on all cores, or inspect a file.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    play_parser = subparsers.add_parser("play", help="play games and append their positions to a file")
+    play_parser.add_argument("engines", nargs="+", help='one or two engines: group ids such as "7" or module paths')
+    play_parser.add_argument("-n", "--games", type=int, default=100, help="number of games")
+    play_parser.add_argument("-o", "--output", default="selfplay.bin", help="the self-play file")
+    play_parser.add_argument("--workers", type=int, help="size of the process pool (default: number of cores)")
+    play_parser.add_argument("--chunk-records", type=int, default=CHUNK_RECORDS, help="records per chunk")
+    info_parser = subparsers.add_parser("info", help="count the positions of a self-play file")
+    info_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "play":
+        if len(args.engines) > 2:
+            parser.error("self-play takes one or two engines")
+        run_selfplay(args.engines, args.games, args.output, args.workers, args.chunk_records)
+    else:
+        positions = 0
+        games = 0
+        results = {1: 0, 0: 0, -1: 0}
+        for position in read_positions(args.path):
+            positions += 1
+            if position.ply == 0:
+                games += 1
+                results[position.result] += 1
+        print(f"{args.path}: {positions} positions from {games} games, "
+              f"red +{results[1]} ={results[0]} -{results[-1]}")
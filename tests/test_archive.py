@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from archive import ArchiveWriter, GameArchive, parse_history_text, read_match_folder
+
+MATCH_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Player 1 VS Player 2")
+
+
+def test_games_read_back_as_written(tmp_path):
+    path = str(tmp_path / "games.bin")
+    games = list(read_match_folder(MATCH_FOLDER))
+    assert games
+    with ArchiveWriter(path) as writer:
+        for game, history, winner in games:
+            writer.add(history, winner, f"Player 1 VS Player 2/Game {game}")
+        writer.add([], None, "empty")
+
+    with GameArchive(path) as archive:
+        assert len(archive) == len(games) + 1
+        for index, (game, history, winner) in enumerate(games):
+            assert archive[index] == (f"Player 1 VS Player 2/Game {game}", winner, history)
+            assert archive.find(f"Player 1 VS Player 2/Game {game}") == index
+        assert archive[-1] == ("empty", None, [])
+        assert archive.find("Player 1 VS Player 3/Game 1") is None
+        assert [game.history for game in archive][:len(games)] == [history for _, history, _ in games]
+        with pytest.raises(IndexError):
+            archive[len(games) + 1]
+
+
+def test_truncated_archive_is_refused(tmp_path):
+    path = tmp_path / "games.bin"
+    with ArchiveWriter(str(path)) as writer:
+        writer.add([(9, 7, 7, 6, 0)], "red")
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError):
+        GameArchive(str(path))
+
+
+def test_history_text_must_be_a_list_of_tuples():
+    assert parse_history_text("[(9, 7, 7, 6, 0), (0, 1, 2, 2, 0)]") == [(9, 7, 7, 6, 0), (0, 1, 2, 2, 0)]
+    assert parse_history_text("[]") == []
+    for text in ("[(9, 7, 7, 6)]", "[(9, 7, 7, 6, 0), __import__('os')]", "[[9, 7, 7, 6, 0]]"):
+        with pytest.raises(ValueError):
+            parse_history_text(text)
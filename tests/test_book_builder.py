@@ -0,0 +1,49 @@
+from book_builder import BookBuilder
+from opening_book import OpeningBook
+from utils import init_board, encode_move
+from zobrist import hash_board, move_key
+
+GAMES = [([(9, 1, 7, 2), (0, 1, 2, 2), (7, 1, 7, 4)], "red"),
+         ([(9, 1, 7, 2), (0, 7, 2, 6)], "black"),
+         ([(7, 1, 7, 4), (0, 1, 2, 2)], "draw"),
+         ([(9, 1, 7, 2), (0, 1, 2, 2), (9, 7, 7, 6)], None)]
+
+
+def build(max_entries, tmp_path):
+    builder = BookBuilder(max_entries=max_entries, temp_dir=str(tmp_path))
+    for history, winner in GAMES:
+        builder.add_game(history, winner)
+    return builder
+
+
+def test_spilled_runs_merge_to_the_same_entries(tmp_path):
+    in_memory = list(build(1000, tmp_path).entries())
+    spilled = build(2, tmp_path)
+    assert len(spilled.runs) > 0
+    assert list(spilled.entries()) == in_memory
+    spilled.runs.close()
+
+
+def test_counts_and_results_of_the_first_move(tmp_path):
+    key = hash_board(init_board())
+    entries = {(entry[0], entry[1]): entry[2:] for entry in build(2, tmp_path).entries()}
+    # count, wins, draws, losses of red's first move, the last game having no result
+    assert entries[(key, encode_move(9, 1, 7, 2))] == (3, 1, 0, 1)
+    assert entries[(key, encode_move(7, 1, 7, 4))] == (1, 0, 1, 0)
+
+
+def test_written_book_is_probed_by_the_players_hash(tmp_path):
+    path = str(tmp_path / "book.bin")
+    builder = build(2, tmp_path)
+    assert builder.write(path, min_count=2) == 2
+    board = init_board()
+    key = move_key(hash_board(board), board[9][1], 9 * 9 + 1, 7 * 9 + 2, 0)
+    book = OpeningBook(path)
+    try:
+        assert book.probe(hash_board(board)) == [((9, 1, 7, 2), 3)]
+        board[7][2] = board[9][1]
+        board[9][1] = 0
+        assert key == hash_board(board, "black")
+        assert book.probe(key) == [((0, 1, 2, 2), 2)]
+    finally:
+        book.close()
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from player_4 import player_4
+from player_5 import player_5
+from player_6 import player_6
+from player_7 import player_7
+from utils import init_board, get_legal_actions, change_round
+
+
+@pytest.mark.parametrize("module", [player_4, player_5, player_6, player_7])
+def test_running_sums_follow_move_and_move_back(module):
+    rng = random.Random(7)
+    board = init_board()
+    player = module.Player("red")
+    player.init_value(board)
+    start_value = player.get_full_value(board)
+    side = "red"
+    actions = []
+    for _ in range(80):
+        action_list = get_legal_actions(board, side, player.history)
+        if not action_list:
+            break
+        # Captures first, so that the walk takes pieces off the board
+        captures = [action for action in action_list if board[action[2]][action[3]] != 0]
+        action = rng.choice(captures or action_list)
+        player.move(board, action[0], action[1], action[2], action[3])
+        actions.append(action)
+        assert player.get_value(board) == player.get_full_value(board)
+        side = change_round(side)
+
+    for action in reversed(actions):
+        player.move_back(board, action[0], action[1], action[2], action[3])
+        assert player.get_value(board) == player.get_full_value(board)
+    assert player.get_value(board) == start_value
+    assert board == init_board()
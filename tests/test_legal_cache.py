@@ -0,0 +1,68 @@
+import random
+
+from utils import LegalActionCache, init_board, get_legal_actions, get_King_location, is_King_attacked, \
+    change_round
+from zobrist import hash_board
+
+# The red Chariot checks the black King on every action, the same Chariot since the second one
+CHECKS = [(5, 0, 5, 3, 0), (0, 3, 0, 4, 0), (5, 3, 0, 3, 0), (0, 4, 1, 4, 0), (0, 3, 1, 3, 0), (1, 4, 2, 4, 0),
+          (1, 3, 2, 3, 0), (2, 4, 1, 4, 0)]
+
+
+def gives_check(board, side, action):
+    eaten_id = board[action[2]][action[3]]
+    board[action[2]][action[3]] = board[action[0]][action[1]]
+    board[action[0]][action[1]] = 0
+    King = get_King_location(board, change_round(side))
+    check = King is not None and is_King_attacked(board, King[0], King[1])
+    board[action[0]][action[1]] = board[action[2]][action[3]]
+    board[action[2]][action[3]] = eaten_id
+    return check
+
+
+def test_cache_agrees_with_get_legal_actions():
+    rng = random.Random(1)
+    cache = LegalActionCache(500)
+    for _ in range(20):
+        board = init_board()
+        history = []
+        side = "red"
+        for _ in range(120):
+            action_list = get_legal_actions(board, side, history)
+            assert cache.get_legal_actions(board, side, history, hash_board(board, side)) == action_list
+            if not action_list:
+                break
+            # Mostly checks and a few actions, so that positions and perpetual checks come back
+            checks = [action for action in action_list if gives_check(board, side, action)]
+            action = rng.choice(checks) if checks and rng.random() < 0.7 else rng.choice(action_list[:4])
+            history.append(action + (board[action[2]][action[3]],))
+            board[action[2]][action[3]] = board[action[0]][action[1]]
+            board[action[0]][action[1]] = 0
+            side = change_round(side)
+    assert cache.hits > 0 and len(cache.table) <= 500
+
+
+def test_same_position_with_a_perpetual_check_is_another_entry():
+    # The position at the end of CHECKS, where the Chariot may not check from (1, 3) again
+    board = tuple([0] * 9 for _ in range(10))
+    board[9][5] = 7
+    board[1][4] = -7
+    board[2][3] = 6
+    board[3][8] = -1
+    board_hash = hash_board(board, "red")
+    cache = LegalActionCache()
+    assert (2, 3, 1, 3) not in cache.get_legal_actions(board, "red", CHECKS, board_hash)
+    assert (2, 3, 1, 3) in cache.get_legal_actions(board, "red", [], board_hash)
+    assert (2, 3, 1, 3) not in cache.get_legal_actions(board, "red", CHECKS, board_hash)
+    assert cache.hits == 1 and cache.misses == 2
+
+
+def test_least_recently_used_list_is_dropped():
+    board = init_board()
+    cache = LegalActionCache(2)
+    for key in (1, 2, 1, 3):
+        action_list = cache.get_legal_actions(board, "red", [], key)
+        action_list.clear()     # the caller's list is a copy
+    assert list(cache.table) == [(1, None), (3, None)]
+    assert cache.get_legal_actions(board, "red", [], 1) == get_legal_actions(board, "red", [])
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,23 @@
+from match import sprt_decision, sprt_llr, sprt_bounds, elo_estimate, SPRT_MIN_GAMES
+
+
+def test_short_run_of_wins_is_inconclusive():
+    for wins in range(1, SPRT_MIN_GAMES):
+        assert sprt_decision(wins, 0, 0, 0, 10, 0.05, 0.05) is None
+        assert sprt_decision(wins, 0, 0, 0, 200, 0.05, 0.05) is None
+
+
+def test_llr_of_few_wins_stays_inside_the_bounds():
+    lower, upper = sprt_bounds(0.05, 0.05)
+    for wins in range(1, 6):
+        assert lower < sprt_llr(wins, 0, 0, 0, 10) < upper
+
+
+def test_long_run_decides():
+    assert sprt_decision(60, 30, 10, 0, 10, 0.05, 0.05) == "H1"
+    assert sprt_decision(10, 30, 60, 0, 10, 0.05, 0.05) == "H0"
+
+
+def test_elo_estimate_of_one_sided_results_has_an_error():
+    elo, error = elo_estimate(5, 0, 0)
+    assert elo > 0 and 0 < error < float('inf')
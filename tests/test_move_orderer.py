@@ -0,0 +1,63 @@
+import random
+
+from search import MoveOrderer, HASH, CAPTURES, KILLERS, COUNTERMOVE, LOSING_CAPTURES, QUIETS
+from utils import init_board, get_legal_actions, get_check_record, change_round
+
+
+def test_every_legal_action_comes_once():
+    rng = random.Random(3)
+    orderer = MoveOrderer()
+    for _ in range(20):
+        board = init_board()
+        history = []
+        side = "red"
+        for _ in range(100):
+            action_list = get_legal_actions(board, side, history)
+            if not action_list:
+                break
+            check_record = get_check_record(board, history)
+            # Killers, countermoves and hash actions that may or may not be legal here
+            candidates = [(rng.randrange(10), rng.randrange(9), rng.randrange(10), rng.randrange(9))
+                          for _ in range(3)] + rng.sample(action_list, min(3, len(action_list)))
+            orderer.killers[5] = [rng.choice(candidates), rng.choice(candidates)]
+            previous = history[-1] if history else None
+            if previous is not None:
+                index = (previous[0] * 9 + previous[1]) * 90 + previous[2] * 9 + previous[3]
+                orderer.countermoves[index] = rng.choice(candidates)
+
+            ordered = list(orderer.actions(board, side, 5, (rng.choice(candidates), None), previous,
+                                           lambda: get_legal_actions(board, side, history, check_record),
+                                           check_record))
+            actions = [action for _, action in ordered]
+            assert sorted(actions) == sorted(action_list)
+            stages = [stage for stage, _ in ordered]
+            assert stages == sorted(stages)
+            for stage, action in ordered:
+                captured = board[action[2]][action[3]] != 0
+                if stage in (CAPTURES, LOSING_CAPTURES):
+                    assert captured
+                elif stage in (KILLERS, COUNTERMOVE, QUIETS):
+                    assert not captured
+
+            action = rng.choice(action_list)
+            history.append(action + (board[action[2]][action[3]],))
+            board[action[2]][action[3]] = board[action[0]][action[1]]
+            board[action[0]][action[1]] = 0
+            side = change_round(side)
+
+
+def test_losing_capture_comes_after_killers():
+    board = tuple([0] * 9 for _ in range(10))
+    board[9][4] = 7
+    board[0][3] = -7
+    board[5][4] = 6         # red Chariot
+    board[3][4] = -1        # black Pawn, defended by the black Chariot
+    board[3][0] = -6
+    orderer = MoveOrderer()
+    killer = (5, 4, 5, 0)
+    orderer.killers[0] = [killer, None]
+    ordered = list(orderer.actions(board, "red", 0, (None,), None, lambda: get_legal_actions(board, "red", []),
+                                   None))
+    assert ordered[0] == (KILLERS, killer)
+    assert (LOSING_CAPTURES, (5, 4, 3, 4)) in ordered
+    assert HASH not in [stage for stage, _ in ordered]
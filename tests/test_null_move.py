@@ -0,0 +1,43 @@
+from utils import get_check_record, get_legal_actions, change_round, NULL_ACTION
+
+# The red Chariot checks the black King on every action, the same Chariot since the second one
+CHECKS = [(5, 0, 5, 3, 0), (0, 3, 0, 4, 0), (5, 3, 0, 3, 0), (0, 4, 1, 4, 0), (0, 3, 1, 3, 0), (1, 4, 2, 4, 0),
+          (1, 3, 2, 3, 0), (2, 4, 1, 4, 0)]
+
+
+def play(history):
+    board = tuple([0] * 9 for _ in range(10))
+    board[9][5] = 7
+    board[0][3] = -7
+    board[5][0] = 6
+    board[3][8] = -1
+    side = "red"
+    for entry in history:
+        if entry != NULL_ACTION:
+            board[entry[2]][entry[3]] = board[entry[0]][entry[1]]
+            board[entry[0]][entry[1]] = 0
+        side = change_round(side)
+    return board, side
+
+
+def test_perpetual_check_is_forbidden():
+    board, side = play(CHECKS)
+    assert side == "red"
+    assert get_check_record(board, CHECKS).perpetual_square() == (2, 3)
+    assert (2, 3, 1, 3) not in get_legal_actions(board, side, CHECKS)
+
+
+def test_null_move_subtree_does_not_flag_the_wrong_side():
+    # Red passes instead: black's record must not be built from red's checks
+    history = CHECKS + [NULL_ACTION]
+    board, side = play(history)
+    assert side == "black"
+    assert get_check_record(board, history).perpetual_square() is None
+    assert get_legal_actions(board, side, history) == get_legal_actions(board, side, [])
+
+    # Neither is red's record below the pass, whose plies no longer alternate
+    for action in get_legal_actions(board, side, history):
+        below = history + [action + (board[action[2]][action[3]],)]
+        below_board, below_side = play(below)
+        assert get_check_record(below_board, below).perpetual_square() is None
+        assert get_legal_actions(below_board, below_side, below) == get_legal_actions(below_board, below_side, [])
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from opening_book import OpeningBook, write_book
+from utils import encode_move
+
+ENTRIES = [(5, encode_move(9, 1, 7, 2), 3), (1, encode_move(6, 0, 5, 0), 1), (5, encode_move(7, 1, 7, 4), 1),
+           (1 << 63, encode_move(0, 1, 2, 2), 2), (5, encode_move(9, 1, 7, 2), 2)]
+
+
+def test_probe_finds_every_move_of_a_position(tmp_path):
+    path = str(tmp_path / "book.bin")
+    assert write_book(path, ENTRIES) == 4
+    book = OpeningBook(path)
+    try:
+        assert len(book) == 4
+        assert sorted(book.probe(5)) == [((7, 1, 7, 4), 1), ((9, 1, 7, 2), 5)]
+        assert book.probe(1) == [((6, 0, 5, 0), 1)]
+        assert book.probe(1 << 63) == [((0, 1, 2, 2), 2)]
+        assert book.probe(0) == [] and book.probe(4) == [] and book.probe((1 << 64) - 1) == []
+        assert book.choose(5, random.Random(1)) in ((7, 1, 7, 4), (9, 1, 7, 2))
+        assert book.choose(4) is None
+    finally:
+        book.close()
+
+
+def test_empty_book(tmp_path):
+    path = str(tmp_path / "book.bin")
+    assert write_book(path, []) == 0
+    book = OpeningBook(path)
+    assert len(book) == 0 and book.probe(5) == []
+    book.close()
+
+
+def test_truncated_book_is_refused(tmp_path):
+    path = tmp_path / "book.bin"
+    write_book(str(path), ENTRIES)
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError):
+        OpeningBook(str(path))
@@ -0,0 +1,60 @@
+import multiprocessing
+
+from headless_game import PlayerWorker
+from player_7 import player_7
+from transposition import SharedTranspositionTable
+from utils import get_legal_actions
+
+# Red mates at once with (2, 8, 0, 8), the other Chariot holding the second row
+MATE_ACTION = (2, 8, 0, 8)
+
+
+def mate_board():
+    board = tuple([0] * 9 for _ in range(10))
+    board[9][3] = 7
+    board[1][0] = 6
+    board[2][8] = 6
+    board[0][4] = -7
+    return board
+
+
+def test_mate_board():
+    board = mate_board()
+    assert MATE_ACTION in get_legal_actions(board, "red", [])
+    board[0][8] = board[2][8]
+    board[2][8] = 0
+    assert get_legal_actions(board, "black", []) == []
+
+
+def test_parallel_search_in_persistent_worker():
+    worker = PlayerWorker(player_7.Player("red", {"threads": 2}))
+    try:
+        assert worker.get_action(mate_board(), []) == MATE_ACTION
+    finally:
+        worker.close()
+
+
+def _policy_in_daemon(queue):
+    queue.put(player_7.Player("red", {"threads": 2}).policy(mate_board()))
+
+
+def test_parallel_search_falls_back_in_a_daemon_process():
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_policy_in_daemon, args=(queue,), daemon=True)
+    process.start()
+    action = queue.get(timeout=30)
+    process.join()
+    assert action == MATE_ACTION
+
+
+def test_shared_table_is_kept_for_the_game():
+    player = player_7.Player("red", {"threads": 2})
+    try:
+        assert player.policy(mate_board()) == MATE_ACTION
+        table = player.transposition_table
+        assert isinstance(table, SharedTranspositionTable)
+        assert player.policy(mate_board()) == MATE_ACTION
+        assert player.transposition_table is table
+    finally:
+        player.close()
+    assert table.memory is None
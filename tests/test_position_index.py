@@ -0,0 +1,41 @@
+from archive import ArchiveWriter
+from position_index import PositionIndex, build_index, position_key
+
+# The first two games share their first two plies, the first one going on
+GAMES = [([(9, 1, 7, 2, 0), (0, 1, 2, 2, 0), (7, 1, 7, 4, 0)], "red"),
+         ([(9, 1, 7, 2, 0), (0, 1, 2, 2, 0)], "black"),
+         ([(7, 1, 7, 4, 0), (0, 7, 2, 6, 0)], None)]
+
+
+def write_archive(tmp_path):
+    path = str(tmp_path / "games.bin")
+    with ArchiveWriter(path) as writer:
+        for index, (history, winner) in enumerate(GAMES):
+            writer.add(history, winner, f"Game {index}")
+    return path
+
+
+def test_spilled_runs_give_the_same_index(tmp_path):
+    archive_path = write_archive(tmp_path)
+    in_memory = str(tmp_path / "memory.idx")
+    spilled = str(tmp_path / "spilled.idx")
+    assert build_index(archive_path, in_memory) == 10
+    assert build_index(archive_path, spilled, max_entries=2, temp_dir=str(tmp_path)) == 10
+    with open(in_memory, "rb") as memory_file, open(spilled, "rb") as spilled_file:
+        assert memory_file.read() == spilled_file.read()
+
+
+def test_continuations_and_occurrences(tmp_path):
+    archive_path = write_archive(tmp_path)
+    path = str(tmp_path / "positions.idx")
+    build_index(archive_path, path)
+    with PositionIndex(path, archive_path) as index:
+        assert len(index) == 10
+        # count, wins, draws, losses for red, the third game having no result
+        assert index.query([]) == [((9, 1, 7, 2), 2, 1, 0, 1), ((7, 1, 7, 4), 1, 0, 0, 0)]
+        # the results are those of black, to move
+        assert index.query([(9, 1, 7, 2)]) == [((0, 1, 2, 2), 2, 1, 0, 1)]
+        assert index.query([(9, 1, 7, 2), (0, 1, 2, 2)]) == [((7, 1, 7, 4), 1, 1, 0, 0), (None, 1, 0, 0, 1)]
+        assert index.occurrences(position_key([(9, 1, 7, 2), (0, 1, 2, 2)])) == [(0, 2), (1, 2)]
+        assert index.query([(9, 7, 7, 6)]) == []
+        assert index.game(2).history == GAMES[2][0]
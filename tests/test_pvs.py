@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from perft import get_position
+from player_7 import player_7
+from search import quiescence
+from utils import get_legal_actions, change_round
+
+EXACT_SEARCH = {"null_move": False, "lmr": False}   # PVS alone is exact, the pruning options are not
+
+
+def alpha_beta(player, board, depth, alpha, beta, side):
+    """Plain fail-soft alpha-beta in negamax form, with the leaves and the end of game of Player 7."""
+
+    if depth == 0:
+        if side == 'red':
+            return quiescence(player, board, alpha, beta, side)
+        return -quiescence(player, board, -beta, -alpha, side)
+    winner = player_7.check_winner(board)
+    if winner != 'None':
+        return float('inf') if winner == side else float('-inf')
+    value = float('-inf')
+    for action in get_legal_actions(board, side, player.history):
+        player.move(board, action[0], action[1], action[2], action[3])
+        value = max(value, -alpha_beta(player, board, depth - 1, -beta, -alpha, change_round(side)))
+        player.move_back(board, action[0], action[1], action[2], action[3])
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            break
+    return value
+
+
+def new_player(board, side):
+    player = player_7.Player(side, EXACT_SEARCH)
+    player.init_value(board)
+    player.board_hash = player.zobrist_hash(board)
+    player.deadline = float('inf')
+    return player
+
+
+# From depth 4 on, iterative_deepening searches aspiration windows (player_7.ASPIRATION_DEPTH)
+@pytest.mark.parametrize("name, depth", [("opening", 4), ("middlegame", 3), ("check", 4), ("endgame", 4)])
+def test_pvs_and_aspiration_windows_keep_the_alpha_beta_value(name, depth):
+    board, side = get_position(name)
+    expected = alpha_beta(new_player(board, side), board, depth, -100000000, 100000000, side)
+
+    value, action = new_player(board, side).negamax(board, depth, -100000000, 100000000, side)
+    assert value == expected
+    assert action in get_legal_actions(board, side, [])
+
+    # iterative_deepening returns values in red's view
+    value, action, completed_depth = new_player(board, side).iterative_deepening(board, time.time(), depth)
+    assert completed_depth == depth
+    assert value == (expected if side == 'red' else -expected)
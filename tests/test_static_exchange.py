@@ -0,0 +1,49 @@
+import copy
+
+from utils import static_exchange
+
+
+def board_with(pieces):
+    board = tuple([0] * 9 for _ in range(10))
+    board[9][5] = 7
+    board[0][3] = -7
+    for (x, y), piece_id in pieces.items():
+        board[x][y] = piece_id
+    return board
+
+
+def exchange(pieces, action):
+    board = board_with(pieces)
+    before = copy.deepcopy(board)
+    gain = static_exchange(board, action)
+    assert board == before
+    return gain
+
+
+def test_undefended_capture_wins_the_piece():
+    assert exchange({(6, 4): 6, (3, 4): -1}, (6, 4, 3, 4)) == 70
+
+
+def test_defended_pawn_costs_the_chariot():
+    assert exchange({(6, 4): 6, (3, 4): -1, (3, 0): -6}, (6, 4, 3, 4)) == 70 - 600
+
+
+def test_chariot_behind_recaptures_through_the_first():
+    assert exchange({(6, 4): 6, (7, 4): 6, (3, 4): -1, (3, 0): -6}, (6, 4, 3, 4)) == 70
+
+
+def test_pawn_takes_chariot_defended_by_a_horse():
+    assert exchange({(5, 4): 1, (4, 4): -6, (2, 3): -4}, (5, 4, 4, 4)) == 600 - 70
+
+
+def test_horse_with_a_blocked_leg_does_not_defend():
+    assert exchange({(6, 4): 6, (4, 4): -1, (2, 3): -4, (3, 3): -1}, (6, 4, 4, 4)) == 70
+
+
+def test_cannon_captures_over_a_screen():
+    assert exchange({(7, 4): 5, (5, 4): 1, (3, 4): -6, (3, 0): -6}, (7, 4, 3, 4)) == 600 - 300
+
+
+def test_cannon_gets_its_screen_when_the_chariot_leaves():
+    # Two pieces stand between the Cannon and the pawn until the Chariot takes it
+    assert exchange({(6, 4): 6, (7, 4): 1, (8, 4): 5, (3, 4): -1, (3, 0): -6}, (6, 4, 3, 4)) == 70
@@ -0,0 +1,251 @@
+import os
+import sys
+import math
+import random
+import argparse
+import importlib
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from headless_game import play_headless_game
+
+SCHEMES = ("round-robin", "gauntlet", "swiss")
+
+
+def load_player(player_id: int, side: str):
+    """Create the Player of group player_id (the class in player_{id}/player_{id}.py) taking side."""
+
+    module = importlib.import_module(f"player_{player_id}.player_{player_id}")
+    return module.Player(side)
+
+
+def silence_players():
+    # Players print their search; keep the streamed results readable
+    sys.stdout = open(os.devnull, "w")
+
+
+def play_game(player_i: int, player_j: int, game: int, side_i: str, timeout: bool = True, persistent: bool = False):
+    """
+    Play one game of a match in a worker of the pool.
+
+    Returns:
+        - (player_i, player_j, game, side_i, winner, text, history), where winner is "red", "black", "draw",
+            or None and text the exception when the game could not be played.
+    """
+
+    try:
+        agent_i = load_player(player_i, side_i)
+        agent_j = load_player(player_j, "black" if side_i == "red" else "red")
+        red, black = (agent_i, agent_j) if side_i == "red" else (agent_j, agent_i)
+        winner, text, history = play_headless_game(red, black, timeout, persistent)
+    except Exception as e:
+        winner, text, history = None, str(e), []
+    return player_i, player_j, game, side_i, winner, text, history
+
+
+class Match:
+    """
+    The games between two groups, played as by final_game_exmaple.fight: games 1-3 with player_i taking red,
+    games 4-6 with player_i taking black, and a playoff game 7 with random sides when the score is level,
+    where a draw goes to black.
+    """
+
+    def __init__(self, player_i: int, player_j: int):
+
+        self.player_i = min(player_i, player_j)
+        self.player_j = max(player_i, player_j)
+        self.win_i = 0
+        self.win_j = 0
+        self.lines = {}     # game: line of summary.txt
+        self.pending = 6
+
+    def games(self):
+        """The first six games: (game, side of player_i)."""
+
+        return [(game, "red" if game in (1, 2, 3) else "black") for game in (1, 2, 3, 4, 5, 6)]
+
+    def record(self, game, side_i, winner, text):
+        """Score a finished game and return its line of summary.txt."""
+
+        i, j = self.player_i, self.player_j
+        side_j = "black" if side_i == "red" else "red"
+        if winner == "draw" and game == 7:
+            winner = "black"
+        if winner is None:
+            line = f"Exception occurred during Player {i} VS Player {j} in Game {game} : {text}"
+        elif winner == side_i:
+            self.win_i += 1
+            line = f"Game {game}: Player {i} wins by taking {side_i}: {text}"
+        elif winner == side_j:
+            self.win_j += 1
+            line = f"Game {game}: Player {j} wins by taking {side_j}: {text}"
+        else:
+            line = f"Game {game}: Draw: {text}"
+        self.lines[game] = line
+        self.pending -= 1
+        return line
+
+    def needs_playoff(self):
+        return self.pending == 0 and 7 not in self.lines and self.win_i == self.win_j
+
+    def summary(self):
+        i, j = self.player_i, self.player_j
+        lines = [f"Playing game: Player {i} VS Player {j}"]
+        lines += [self.lines[game] for game in sorted(self.lines)]
+        lines.append(f"Player {i} : Player {j} is {self.win_i} : {self.win_j}")
+        if self.win_i > self.win_j:
+            lines.append(f"Finally Player {i} wins and Player {j} loses!")
+        elif self.win_i < self.win_j:
+            lines.append(f"Finally Player {j} wins and Player {i} loses!")
+        return "\n".join(lines)
+
+    def folder(self, output_dir):
+        return os.path.join(output_dir, f"Player {self.player_i} VS Player {self.player_j}")
+
+
+def run_matches(pairs, executor, output_dir: str = ".", timeout: bool = True, persistent: bool = False):
+    """
+    Play the matches of pairs concurrently on executor, writing "Player i VS Player j/Game k.txt" as every
+    game finishes and summary.txt as every match finishes.
+
+    Yields:
+        - every finished Match, in the order they finish. A line is printed for every finished game.
+    """
+
+    matches = {}
+    futures = set()
+    for player_i, player_j in pairs:
+        match = Match(player_i, player_j)
+        matches[(match.player_i, match.player_j)] = match
+        os.makedirs(match.folder(output_dir), exist_ok=True)
+        for game, side_i in match.games():
+            futures.add(executor.submit(play_game, match.player_i, match.player_j, game, side_i, timeout, persistent))
+
+    while futures:
+        done, futures = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            player_i, player_j, game, side_i, winner, text, history = future.result()
+            match = matches[(player_i, player_j)]
+            with open(os.path.join(match.folder(output_dir), f"Game {game}.txt"), "w") as game_file:
+                game_file.write(str(history))
+            print(f"Player {player_i} VS Player {player_j}, {match.record(game, side_i, winner, text)}", flush=True)
+
+            if match.needs_playoff():
+                match.pending = 1
+                side_i = random.choice(("red", "black"))
+                futures.add(executor.submit(play_game, player_i, player_j, 7, side_i, timeout, persistent))
+            elif match.pending == 0:
+                with open(os.path.join(match.folder(output_dir), "summary.txt"), "w") as summary_file:
+                    summary_file.write(match.summary())
+                yield match
+
+
+def round_robin(players):
+    """Every group plays every other group once."""
+
+    players = sorted(players)
+    return [(i, j) for index, i in enumerate(players) for j in players[index + 1:]]
+
+
+def gauntlet(players, champion: int):
+    """The champion plays every other group."""
+
+    return [(champion, j) for j in sorted(players) if j != champion]
+
+
+def swiss_pairings(standings, played):
+    """
+    Pair the groups of one Swiss round: from the top of the standings, each group meets the highest placed
+    group it has not met yet. With an odd number of groups, the lowest placed group without a bye sits out.
+
+    Args:
+        - standings: {player: [points, game wins, byes]}.
+        - played: a set of frozenset pairs already played.
+
+    Returns:
+        - pairs, bye: the pairs of the round and the group sitting out (None if there is none).
+    """
+
+    order = sorted(standings, key=lambda player: (-standings[player][0], -standings[player][1], player))
+    bye = None
+    if len(order) % 2 == 1:
+        bye = next((player for player in reversed(order) if standings[player][2] == 0), order[-1])
+        order.remove(bye)
+
+    pairs = []
+    while order:
+        player = order.pop(0)
+        opponent = next((other for other in order if frozenset((player, other)) not in played), order[0])
+        order.remove(opponent)
+        pairs.append((player, opponent))
+    return pairs, bye
+
+
+def run_tournament(players, scheme: str = "round-robin", champion: int = None, rounds: int = None,
+                   workers: int = None, output_dir: str = ".", timeout: bool = True, persistent: bool = False):
+    """
+    Play a tournament between groups, with all games of a round running in parallel.
+
+    Args:
+        - players: ids (1~10) of the groups taking part.
+        - scheme: "round-robin", "gauntlet" (champion against every other group) or "swiss".
+        - champion: the group of the gauntlet.
+        - rounds: the number of Swiss rounds, enough to separate the groups (log2 of their number) by default.
+        - workers: the size of the process pool, the number of cores by default.
+        - output_dir: where the "Player i VS Player j" folders are written.
+        - timeout, persistent: passed to play_headless_game.
+
+    Returns:
+        - standings: {player: [points, game wins, byes]}, a won match being worth 1 point and a level one 0.5.
+    """
+
+    standings = {player: [0, 0, 0] for player in players}
+
+    def score(match):
+        standings[match.player_i][1] += match.win_i
+        standings[match.player_j][1] += match.win_j
+        if match.win_i == match.win_j:
+            standings[match.player_i][0] += 0.5
+            standings[match.player_j][0] += 0.5
+        else:
+            standings[match.player_i if match.win_i > match.win_j else match.player_j][0] += 1
+        print(f"Player {match.player_i} : Player {match.player_j} is {match.win_i} : {match.win_j}", flush=True)
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=silence_players) as executor:
+        if scheme == "swiss":
+            played = set()
+            for _ in range(rounds or math.ceil(math.log2(max(len(players), 2)))):
+                pairs, bye = swiss_pairings(standings, played)
+                if bye is not None:
+                    standings[bye][0] += 1
+                    standings[bye][2] += 1
+                played.update(frozenset(pair) for pair in pairs)
+                for match in run_matches(pairs, executor, output_dir, timeout, persistent):
+                    score(match)
+        else:
+            pairs = gauntlet(players, champion) if scheme == "gauntlet" else round_robin(players)
+            for match in run_matches(pairs, executor, output_dir, timeout, persistent):
+                score(match)
+
+    print("Standings:")
+    for player in sorted(standings, key=lambda player: (-standings[player][0], -standings[player][1], player)):
+        points, game_wins, _ = standings[player]
+        print(f"Player {player}: {points} points, {game_wins} games won")
+    return standings
+
+
+if __name__ == "__main__":    # for Windows OS
+    parser = argparse.ArgumentParser(description="Play a tournament between groups on all cores.")
+    parser.add_argument("players", type=int, nargs="+", help="ids (1~10) of the groups")
+    parser.add_argument("--scheme", choices=SCHEMES, default="round-robin")
+    parser.add_argument("--champion", type=int, help="the group playing the gauntlet")
+    parser.add_argument("--rounds", type=int, help="number of Swiss rounds")
+    parser.add_argument("--workers", type=int, help="size of the process pool (default: number of cores)")
+    parser.add_argument("--output-dir", default=".", help='where the "Player i VS Player j" folders go')
+    parser.add_argument("--no-timeout", action="store_true", help="no limit on the thinking time")
+    parser.add_argument("--persistent", action="store_true", help="one worker process per player and game")
+    args = parser.parse_args()
+
+    if args.scheme == "gauntlet" and args.champion not in args.players:
+        parser.error("--champion must be one of the players for a gauntlet")
+    run_tournament(args.players, args.scheme, args.champion, args.rounds, args.workers, args.output_dir,
+                   not args.no_timeout, args.persistent)
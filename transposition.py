@@ -0,0 +1,236 @@
+import os
+from array import array
+from multiprocessing import shared_memory
+
+from utils import encode_move, move_to_action
+
+# Bound flags of a stored value
+EXACT = 0   # the value is exact
+LOWER = 1   # the search failed high, the value is a lower bound
+UPPER = 2   # the search failed low, the value is an upper bound
+
+# Layout of the 64-bit data word of an entry
+_VALUE_OFFSET = 1 << 31
+_VALUE_LIMIT = (1 << 31) - 1     # float('inf') and float('-inf') are stored as +/- this limit
+_MOVE_SHIFT = 32
+_DEPTH_SHIFT = 50
+_FLAG_SHIFT = 57
+_AGE_SHIFT = 59
+_MAX_DEPTH = 127
+_AGE_MASK = 31
+
+_ENTRY_BYTES = 16   # one 64-bit key word and one 64-bit data word
+_BUCKET_SIZE = 2    # slot 0 is depth-preferred, slot 1 is always replaced
+
+
+def _bucket_count(size_mb):
+    # The largest power of two of buckets fitting in size_mb
+    buckets = 1
+    while (buckets * 2) * _BUCKET_SIZE * _ENTRY_BYTES <= size_mb * 1024 * 1024:
+        buckets *= 2
+    return buckets
+
+
+def bound_flag(value, alpha, beta):
+    """The flag of a value returned by an alpha-beta search called with the window (alpha, beta)."""
+
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
+
+
+def pack_entry(depth, flag, value, action, age=0):
+    """Pack an entry into one 64-bit data word."""
+
+    if value == float('inf') or value >= _VALUE_LIMIT:
+        value = _VALUE_LIMIT
+    elif value == float('-inf') or value <= -_VALUE_LIMIT:
+        value = -_VALUE_LIMIT
+    move = 0 if action is None else encode_move(action[0], action[1], action[2], action[3])
+    return (int(value) + _VALUE_OFFSET) | move << _MOVE_SHIFT | min(depth, _MAX_DEPTH) << _DEPTH_SHIFT \
+        | flag << _FLAG_SHIFT | (age & _AGE_MASK) << _AGE_SHIFT
+
+
+def unpack_entry(data):
+    """Unpack a data word into (depth, flag, value, action)."""
+
+    value = (data & 0xFFFFFFFF) - _VALUE_OFFSET
+    if value == _VALUE_LIMIT:
+        value = float('inf')
+    elif value == -_VALUE_LIMIT:
+        value = float('-inf')
+    move = data >> _MOVE_SHIFT & 0x3FFFF
+    action = move_to_action(move) if move else None
+    return data >> _DEPTH_SHIFT & _MAX_DEPTH, data >> _FLAG_SHIFT & 3, value, action
+
+
+class TranspositionTable:
+    """
+    A fixed-size transposition table keyed by 64-bit Zobrist hash.
+
+    Entries live in two flat arrays of 64-bit words allocated once, so memory stays flat however long the
+    game is. Every bucket has two slots: the first keeps the deepest (or most recent generation) entry,
+    the second takes whatever the first refuses. The key word stores key XOR data, so a slot whose two
+    words do not belong together never verifies.
+
+    Args:
+        - size_mb: memory cap of the table in megabytes.
+    """
+
+    def __init__(self, size_mb: float = 16):
+
+        buckets = _bucket_count(size_mb)
+        self.mask = buckets - 1
+        self.keys = array('Q', bytes(8 * buckets * _BUCKET_SIZE))
+        self.data = array('Q', bytes(8 * buckets * _BUCKET_SIZE))
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0     # misses on a bucket holding other positions
+        self.stores = 0
+        self.replacements = 0   # stores overwriting another position
+
+    def clear(self):
+        self.keys = array('Q', bytes(8 * len(self.keys)))
+        self.data = array('Q', bytes(8 * len(self.data)))
+        self.age = 0
+
+    def close(self):
+        """Nothing to free for a table in the memory of the process; see SharedTranspositionTable.close."""
+
+    def copy_from(self, table):
+        """Take the entries, generation and counters of a table of the same size, shared or not."""
+
+        memoryview(self.keys)[:] = memoryview(table.keys)
+        memoryview(self.data)[:] = memoryview(table.data)
+        self.age = table.age
+        for name in ("hits", "misses", "collisions", "stores", "replacements"):
+            setattr(self, name, getattr(table, name))
+
+    def new_search(self):
+        """Start a new generation, so the entries of earlier moves are replaced first."""
+
+        self.age = (self.age + 1) & _AGE_MASK
+
+    def probe(self, key):
+        """
+        Look a position up.
+
+        Returns:
+            - (depth, flag, value, action) of the stored entry, or None when the position is not stored.
+        """
+
+        index = (key & self.mask) * _BUCKET_SIZE
+        keys = self.keys
+        data = self.data
+        for slot in (index, index + 1):
+            word = data[slot]
+            if word and keys[slot] ^ word == key:
+                self.hits += 1
+                return unpack_entry(word)
+        self.misses += 1
+        if data[index] or data[index + 1]:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, flag, value, action):
+        """Store the result of a search of depth plies, with its bound flag and best action."""
+
+        index = (key & self.mask) * _BUCKET_SIZE
+        keys = self.keys
+        data = self.data
+        word = pack_entry(depth, flag, value, action, self.age)
+        self.stores += 1
+
+        # The same position is overwritten in place, unless a deeper bound of this generation is stored;
+        # the best action of the earlier search is kept if this one has none
+        for slot in (index, index + 1):
+            old = data[slot]
+            if old and keys[slot] ^ old == key:
+                if action is None:
+                    word |= old & (0x3FFFF << _MOVE_SHIFT)
+                if flag == EXACT or depth >= (old >> _DEPTH_SHIFT & _MAX_DEPTH) or (old >> _AGE_SHIFT) != self.age:
+                    keys[slot] = key ^ word
+                    data[slot] = word
+                return
+
+        # Depth-preferred slot: taken when empty, from an older generation, or not deeper than the new entry
+        old = data[index]
+        if not old or (old >> _AGE_SHIFT) != self.age or (old >> _DEPTH_SHIFT & _MAX_DEPTH) <= depth:
+            slot = index
+        else:
+            slot = index + 1
+        if data[slot]:
+            self.replacements += 1
+        keys[slot] = key ^ word
+        data[slot] = word
+
+    def stats(self):
+        """Counters of the table since the last reset_stats, and how full it is."""
+
+        probes = self.hits + self.misses
+        used = sum(1 for word in self.data if word)
+        return {"hits": self.hits, "misses": self.misses, "collisions": self.collisions,
+                "hit_rate": self.hits / probes if probes else 0.0, "stores": self.stores,
+                "replacements": self.replacements, "fill": used / len(self.data)}
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    A transposition table in shared memory, probed and stored by several processes at once without a lock.
+
+    The two words of an entry are written one after the other, so two processes storing to the same slot at
+    the same time may leave the key word of one entry next to the data word of the other. Such a slot does
+    not verify (its key word XOR its data word is no key) and reads as a miss. The table is pickled by the
+    name of its memory block, so a process started with it attaches to the same entries, and the counters
+    are those of each process.
+
+    Args:
+        - size_mb: memory cap of the table in megabytes.
+        - name: the memory block of an existing table, or None to create one, which only this table may free,
+            in the process that created it.
+    """
+
+    def __init__(self, size_mb: float = 16, name: str = None):
+
+        buckets = _bucket_count(size_mb)
+        words = buckets * _BUCKET_SIZE
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=16 * words)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.owner = os.getpid() if name is None else None    # only the creating process frees, not a fork of it
+        self.size_mb = size_mb
+        self.mask = buckets - 1
+        self.keys = self.memory.buf[:8 * words].cast('Q')
+        self.data = self.memory.buf[8 * words:16 * words].cast('Q')
+        self.age = 0
+        self.reset_stats()
+
+    def __getstate__(self):
+        return {"size_mb": self.size_mb, "name": self.memory.name, "age": self.age}
+
+    def __setstate__(self, state):
+        self.__init__(state["size_mb"], state["name"])
+        self.age = state["age"]
+
+    def clear(self):
+        self.memory.buf[:16 * len(self.keys)] = bytes(16 * len(self.keys))
+        self.age = 0
+
+    def close(self):
+        """Detach from the memory block, and free it if this table created it. The table can not be used after."""
+
+        if self.memory is None:
+            return
+        self.keys.release()
+        self.data.release()
+        self.memory.close()
+        if self.owner == os.getpid():
+            self.memory.unlink()
+        self.memory = None
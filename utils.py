@@ -1,4 +1,5 @@
-import copy
+from array import array
+from collections import OrderedDict
 
 
 def init_board():   # Initialize chessboard
@@ -16,7 +17,7 @@ def init_board():   # Initialize chessboard
 
 
 # Generate all feasible actions for side based on the current board and history
-def get_legal_actions(board: tuple, side: str, history: list):
+def get_legal_actions(board: tuple, side: str, history: list, check_record=None):
     """
     return the list of all legal actions according to the input board.
 
@@ -26,6 +27,8 @@ def get_legal_actions(board: tuple, side: str, history: list):
         - side: is a string ("red" or "black"), indicating which side you are querying.
         - history: records previous action sequences as a list. It is necessary because some illegal 
             actions are caused by history.
+        - check_record: an optional CheckRecord kept up to date with history by the caller. When it is not
+            given, one is rebuilt from the last plies of history.
 
     Returns:
         - action_list : a list of actions, with each action being a four-element tuple. An action is 
@@ -33,8 +36,6 @@ def get_legal_actions(board: tuple, side: str, history: list):
             if legal and (possibly) eating the original piece at (new_x, new_y).
     """
 
-    action_list = []
-    candidate_action_list = []
     red_piece = []
     black_piece = []
 
@@ -67,6 +68,18 @@ def get_legal_actions(board: tuple, side: str, history: list):
     elif side == "black":
         pieces = black_piece
 
+    if check_record is None and len(history) > 6:
+        check_record = get_check_record(board, history)
+
+    return get_pieces_actions(board, pieces, check_record)
+
+
+# Generate the legal actions of one side from the list of its pieces, whose last element is the King
+def get_pieces_actions(board, pieces, check_record=None):
+
+    action_list = []
+    candidate_action_list = []
+
     # Generate candidate actions
     for piece in pieces:
         id = piece[0]
@@ -74,85 +87,294 @@ def get_legal_actions(board: tuple, side: str, history: list):
         y = piece[2]
         candidate_action_list += get_one_piece_action(board, id, x, y)
 
+    # Only a king move, a pinned piece or a move onto a cannon line can expose the King when
+    # the side is not in check, so every other action skips the full King safety test
+    King = pieces[-1]
+    King_x = King[1]
+    King_y = King[2]
+    in_check = is_King_attacked(board, King_x, King_y)
+    if in_check:
+        pinned = None
+    else:
+        pinned = get_pinned_squares(board, King_x, King_y)
+
     # Check if King is attacked and if there is some piece attacking King for three times
     for action in candidate_action_list:
-        if check_King_attacked(board, action, red_piece, black_piece) == False:
-            if check_history(board, action, history) == False:
-                action_list.append(action)
+        if in_check or (action[0], action[1]) in pinned or (action[2], action[3]) in pinned \
+                or (action[0], action[1]) == (King_x, King_y):
+            if check_King_exposed(board, action, King_x, King_y):
+                continue
+        if check_record is None or check_record.is_perpetual(board, action) == False:
+            action_list.append(action)
 
     return action_list
 
 
+# ---------------------------------Move Tables---------------------------------
+# Every piece's targets are computed once at import time, so move generation is a
+# short walk over a table instead of probing each square through rule().
+# Tables are indexed by square = x * 9 + y and keep the order of the original
+# target lists, so the generated actions come out in the same order as before.
+
+def _in_board(x, y):
+    return 0 <= x <= 9 and 0 <= y <= 8
+
+
+def _build_pawn_table(piece_id):
+    table = []
+    for x in range(10):
+        for y in range(9):
+            targets = []
+            for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                new_x = x + dx
+                new_y = y + dy
+                if not _in_board(new_x, new_y):
+                    continue
+                if piece_id == 1 and (dx == -1 or (dx == 0 and x <= 4)):
+                    targets.append((new_x, new_y))
+                elif piece_id == -1 and (dx == 1 or (dx == 0 and x >= 5)):
+                    targets.append((new_x, new_y))
+            table.append(tuple(targets))
+    return table
+
+
+def _build_step_table(points, deltas):
+    # Targets are the fixed points of the original lists reachable by one of the deltas
+    table = []
+    for x in range(10):
+        for y in range(9):
+            table.append(tuple((new_x, new_y) for new_x, new_y in points
+                               if (new_x - x, new_y - y) in deltas))
+    return table
+
+
+def _build_elephant_table(points):
+    # Each target carries its elephant eye, which must be empty
+    table = []
+    for x in range(10):
+        for y in range(9):
+            table.append(tuple((new_x, new_y, (x + new_x) // 2, (y + new_y) // 2) for new_x, new_y in points
+                               if abs(new_x - x) == 2 and abs(new_y - y) == 2))
+    return table
+
+
+def _build_horse_table():
+    # Each target carries its horse leg, which must be empty
+    table = []
+    for x in range(10):
+        for y in range(9):
+            targets = []
+            for dx, dy in ((-2, -1), (-2, 1), (2, -1), (2, 1), (-1, 2), (1, 2), (-1, -2), (1, -2)):
+                new_x = x + dx
+                new_y = y + dy
+                if _in_board(new_x, new_y):
+                    if abs(dx) == 2:
+                        targets.append((new_x, new_y, x + dx // 2, y))
+                    else:
+                        targets.append((new_x, new_y, x, y + dy // 2))
+            table.append(tuple(targets))
+    return table
+
+
+def _build_ray_table():
+    # Four rays per square (up, down, left, right), each ordered from near to far
+    table = []
+    for x in range(10):
+        for y in range(9):
+            up = tuple((i, y) for i in range(x - 1, -1, -1))
+            down = tuple((i, y) for i in range(x + 1, 10))
+            left = tuple((x, j) for j in range(y - 1, -1, -1))
+            right = tuple((x, j) for j in range(y + 1, 9))
+            table.append((up, down, left, right))
+    return table
+
+
+_DIAGONAL = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+_ORTHOGONAL = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+PAWN_MOVES = {1: _build_pawn_table(1), -1: _build_pawn_table(-1)}
+ADVISOR_MOVES = {2: _build_step_table(((9, 3), (9, 5), (8, 4), (7, 5), (7, 3)), _DIAGONAL),
+                 -2: _build_step_table(((0, 3), (0, 5), (1, 4), (2, 3), (2, 5)), _DIAGONAL)}
+ELEPHANT_MOVES = {3: _build_elephant_table(((9, 2), (7, 4), (7, 0), (5, 2), (5, 6), (9, 6), (7, 8))),
+                  -3: _build_elephant_table(((0, 2), (2, 0), (4, 2), (2, 4), (0, 6), (4, 6), (2, 8)))}
+HORSE_MOVES = _build_horse_table()
+KING_MOVES = {7: _build_step_table(tuple((i, j) for i in (9, 8, 7) for j in (3, 4, 5)), _ORTHOGONAL),
+              -7: _build_step_table(tuple((i, j) for i in (0, 1, 2) for j in (3, 4, 5)), _ORTHOGONAL)}
+RAYS = _build_ray_table()
+
+
+def _invert_table(table, with_block=False):
+    # For every square, the squares a piece could attack it from (and the block square, if any)
+    inverted = [[] for _ in range(90)]
+    for square, targets in enumerate(table):
+        x, y = divmod(square, 9)
+        for target in targets:
+            if with_block:
+                inverted[target[0] * 9 + target[1]].append((x, y, target[2], target[3]))
+            else:
+                inverted[target[0] * 9 + target[1]].append((x, y))
+    return [tuple(sources) for sources in inverted]
+
+
+PAWN_ATTACKS = {1: _invert_table(PAWN_MOVES[1]), -1: _invert_table(PAWN_MOVES[-1])}
+HORSE_ATTACKS = _invert_table(HORSE_MOVES, with_block=True)
+ADVISOR_ATTACKS = {2: _invert_table(ADVISOR_MOVES[2]), -2: _invert_table(ADVISOR_MOVES[-2])}
+ELEPHANT_ATTACKS = {3: _invert_table(ELEPHANT_MOVES[3], with_block=True),
+                    -3: _invert_table(ELEPHANT_MOVES[-3], with_block=True)}
+KING_ATTACKS = {7: _invert_table(KING_MOVES[7]), -7: _invert_table(KING_MOVES[-7])}
+
+
+def _slide(board, piece_id, ray):  # Targets of a chariot or cannon along one ray, from near to far
+    targets = []
+    if piece_id in (6, -6):
+        for new_x, new_y in ray:
+            target_id = board[new_x][new_y]
+            if target_id == 0:
+                targets.append((new_x, new_y))
+            else:
+                if target_id * piece_id < 0:
+                    targets.append((new_x, new_y))
+                break
+    else:
+        screened = False
+        for new_x, new_y in ray:
+            target_id = board[new_x][new_y]
+            if not screened:
+                if target_id == 0:
+                    targets.append((new_x, new_y))
+                else:
+                    screened = True
+            elif target_id != 0:
+                if target_id * piece_id < 0:
+                    targets.append((new_x, new_y))
+                break
+    return targets
+
+
 # Generate action of a certain chess piece
 def get_one_piece_action(board, piece_id, old_x, old_y):
     action_list = []
+    square = old_x * 9 + old_y
 
     # Red Pawn and Black Pawn
     if piece_id in (1, -1):
-        dx = [-1, 1, 0, 0]
-        dy = [0, 0, -1, 1]
-        for i in range(4):
-            new_x = old_x + dx[i]
-            new_y = old_y + dy[i]
-            if 0 <= new_x <= 9 and 0 <= new_y <= 8 and rule(board, piece_id, old_x, old_y, new_x, new_y):
+        for new_x, new_y in PAWN_MOVES[piece_id][square]:
+            if board[new_x][new_y] * piece_id <= 0:
                 action_list.append((old_x, old_y, new_x, new_y))
 
     # Red Advisor and Black Advisor
     elif piece_id in (2, -2):
-        if piece_id == 2:
-            x = [9, 9, 8, 7, 7]
-            y = [3, 5, 4, 5, 3]
-        elif piece_id == -2:
-            x = [0, 0, 1, 2, 2]
-            y = [3, 5, 4, 3, 5]
-
-        for i in range(5):
-            if rule(board, piece_id, old_x, old_y, x[i], y[i]):
-                action_list.append((old_x, old_y, x[i], y[i]))
+        for new_x, new_y in ADVISOR_MOVES[piece_id][square]:
+            if board[new_x][new_y] * piece_id <= 0:
+                action_list.append((old_x, old_y, new_x, new_y))
 
     # Red Elephant and Black Elephant
     elif piece_id in (3, -3):
-        if piece_id == 3:
-            x = [9, 7, 7, 5, 5, 9, 7]
-            y = [2, 4, 0, 2, 6, 6, 8]
-        elif piece_id == -3:
-            x = [0, 2, 4, 2, 0, 4, 2]
-            y = [2, 0, 2, 4, 6, 6, 8]
-        for i in range(7):
-            if rule(board, piece_id, old_x, old_y, x[i], y[i]):
-                action_list.append((old_x, old_y, x[i], y[i]))
+        for new_x, new_y, eye_x, eye_y in ELEPHANT_MOVES[piece_id][square]:
+            if board[new_x][new_y] * piece_id <= 0 and board[eye_x][eye_y] == 0:
+                action_list.append((old_x, old_y, new_x, new_y))
 
     # Red Horse and black Horse
     elif piece_id in (4, -4):
-        dx = [-2, -2, 2, 2, -1, 1, -1, 1]
-        dy = [-1, 1, -1, 1, 2, 2, -2, -2]
-        for i in range(8):
-            new_x = old_x + dx[i]
-            new_y = old_y + dy[i]
-            if 0 <= new_x <= 9 and 0 <= new_y <= 8 and rule(board, piece_id, old_x, old_y, new_x, new_y):
+        for new_x, new_y, leg_x, leg_y in HORSE_MOVES[square]:
+            if board[new_x][new_y] * piece_id <= 0 and board[leg_x][leg_y] == 0:
                 action_list.append((old_x, old_y, new_x, new_y))
 
     # Red Cannon, Black Cannon, Red Chariot and Black Chariot
     elif piece_id in (5, -5, 6, -6):
-        for new_x in range(10):
-            if rule(board, piece_id, old_x, old_y, new_x, old_y):
-                action_list.append((old_x, old_y, new_x, old_y))
-        for new_y in range(9):
-            if rule(board, piece_id, old_x, old_y, old_x, new_y):
-                action_list.append((old_x, old_y, old_x, new_y))
+        # Same order as scanning the column and then the row from index 0
+        up, down, left, right = RAYS[square]
+        for new_x, new_y in reversed(_slide(board, piece_id, up)):
+            action_list.append((old_x, old_y, new_x, new_y))
+        for new_x, new_y in _slide(board, piece_id, down):
+            action_list.append((old_x, old_y, new_x, new_y))
+        for new_x, new_y in reversed(_slide(board, piece_id, left)):
+            action_list.append((old_x, old_y, new_x, new_y))
+        for new_x, new_y in _slide(board, piece_id, right):
+            action_list.append((old_x, old_y, new_x, new_y))
 
     # Red King and Black King
     elif piece_id in (7, -7):
-        if piece_id == 7:
-            x = [9, 9, 9, 8, 8, 8, 7, 7, 7]
-            y = [3, 4, 5, 3, 4, 5, 3, 4, 5]
-        elif piece_id == -7:
-            x = [0, 0, 0, 1, 1, 1, 2, 2, 2]
-            y = [3, 4, 5, 3, 4, 5, 3, 4, 5]
-        for i in range(9):
-            if (rule(board, piece_id, old_x, old_y, x[i], y[i])):
-                action_list.append((old_x, old_y, x[i], y[i]))
+        for new_x, new_y in KING_MOVES[piece_id][square]:
+            if board[new_x][new_y] * piece_id <= 0:
+                action_list.append((old_x, old_y, new_x, new_y))
+
+    return action_list
 
+
+# Generate the actions of a certain chess piece that eat an enemy piece
+def get_one_piece_captures(board, piece_id, old_x, old_y):
+    action_list = []
+    square = old_x * 9 + old_y
+
+    if piece_id in (1, -1):
+        targets = PAWN_MOVES[piece_id][square]
+    elif piece_id in (2, -2):
+        targets = ADVISOR_MOVES[piece_id][square]
+    elif piece_id in (7, -7):
+        targets = KING_MOVES[piece_id][square]
+    elif piece_id in (3, -3):
+        targets = [(new_x, new_y) for new_x, new_y, eye_x, eye_y in ELEPHANT_MOVES[piece_id][square]
+                   if board[eye_x][eye_y] == 0]
+    elif piece_id in (4, -4):
+        targets = [(new_x, new_y) for new_x, new_y, leg_x, leg_y in HORSE_MOVES[square]
+                   if board[leg_x][leg_y] == 0]
+    else:
+        # A Chariot eats the first piece on a ray, a Cannon the second one
+        targets = []
+        skip = 0 if piece_id in (6, -6) else 1
+        for ray in RAYS[square]:
+            seen = 0
+            for new_x, new_y in ray:
+                if board[new_x][new_y] != 0:
+                    if seen == skip:
+                        targets.append((new_x, new_y))
+                        break
+                    seen += 1
+
+    for new_x, new_y in targets:
+        if board[new_x][new_y] * piece_id < 0:
+            action_list.append((old_x, old_y, new_x, new_y))
+    return action_list
+
+
+# Generate the capturing actions of side, for a quiescence search
+def get_capture_actions(board: tuple, side: str):
+    """
+    return the legal actions of side that eat an enemy piece.
+
+    Only the safety of the own King is tested; the perpetual check rule, which needs the history, is not.
+    The actions are a subset of get_legal_actions whenever that rule does not apply.
+    """
+
+    sign = 1 if side == "red" else -1
+    King = None
+    candidate_action_list = []
+    for i in range(10):
+        for j in range(9):
+            piece_id = board[i][j]
+            if piece_id * sign > 0:
+                if piece_id == 7 * sign:
+                    King = (i, j)
+                candidate_action_list += get_one_piece_captures(board, piece_id, i, j)
+
+    if King is None:
+        return candidate_action_list
+
+    King_x, King_y = King
+    in_check = is_King_attacked(board, King_x, King_y)
+    if in_check:
+        pinned = None
+    else:
+        pinned = get_pinned_squares(board, King_x, King_y)
+
+    action_list = []
+    for action in candidate_action_list:
+        if in_check or (action[0], action[1]) in pinned or (action[2], action[3]) in pinned \
+                or (action[0], action[1]) == King:
+            if check_King_exposed(board, action, King_x, King_y):
+                continue
+        action_list.append(action)
     return action_list
 
 
@@ -345,9 +567,215 @@ def rule(board, piece_id, old_x, old_y, new_x, new_y):  # Check whether the acti
     return False
 
 
+# Get the squares of the enemy pieces attacking the King at (King_x, King_y)
+def get_King_attackers(board, King_x, King_y, first=False):
+    """
+    Scan outward from the King square instead of asking every enemy piece whether it reaches the King.
+
+    Args:
+        - board: the chessboard, with the King of interest standing on (King_x, King_y).
+        - first: stop at the first attacker found, which is all a legality test needs.
+
+    Returns:
+        - attackers: a list of (x, y) squares of the enemy pieces giving check.
+    """
+
+    sign = 1 if board[King_x][King_y] > 0 else -1
+    square = King_x * 9 + King_y
+    attackers = []
+
+    # Chariot and facing King on the first piece of a ray, Cannon on the second one
+    for direction, ray in enumerate(RAYS[square]):
+        screened = False
+        for x, y in ray:
+            piece_id = board[x][y]
+            if piece_id == 0:
+                continue
+            if not screened:
+                if piece_id == -6 * sign or (piece_id == -7 * sign and direction < 2):
+                    attackers.append((x, y))
+                    if first:
+                        return attackers
+                screened = True
+            else:
+                if piece_id == -5 * sign:
+                    attackers.append((x, y))
+                    if first:
+                        return attackers
+                break
+
+    # Horse with its leg free
+    for x, y, leg_x, leg_y in HORSE_ATTACKS[square]:
+        if board[x][y] == -4 * sign and board[leg_x][leg_y] == 0:
+            attackers.append((x, y))
+            if first:
+                return attackers
+
+    # Pawn
+    for x, y in PAWN_ATTACKS[-sign][square]:
+        if board[x][y] == -sign:
+            attackers.append((x, y))
+            if first:
+                return attackers
+
+    return attackers
+
+
+def is_King_attacked(board, King_x, King_y):
+    return len(get_King_attackers(board, King_x, King_y, first=True)) > 0
+
+
+def get_least_attacker(board, x, y, sign):
+    """
+    The least valuable piece of the side of sign (1 red, -1 black) attacking the square (x, y), whatever stands on
+    it. Pins and the safety of the own King are not considered.
+
+    Returns:
+        - (attacker_x, attacker_y), or None when the square is not attacked.
+    """
+
+    square = x * 9 + y
+    for attacker_x, attacker_y in PAWN_ATTACKS[sign][square]:
+        if board[attacker_x][attacker_y] == sign:
+            return attacker_x, attacker_y
+    for attacker_x, attacker_y in ADVISOR_ATTACKS[2 * sign][square]:
+        if board[attacker_x][attacker_y] == 2 * sign:
+            return attacker_x, attacker_y
+    for attacker_x, attacker_y, eye_x, eye_y in ELEPHANT_ATTACKS[3 * sign][square]:
+        if board[attacker_x][attacker_y] == 3 * sign and board[eye_x][eye_y] == 0:
+            return attacker_x, attacker_y
+    for attacker_x, attacker_y, leg_x, leg_y in HORSE_ATTACKS[square]:
+        if board[attacker_x][attacker_y] == 4 * sign and board[leg_x][leg_y] == 0:
+            return attacker_x, attacker_y
+
+    # Chariot on the first piece of a ray, Cannon on the second one
+    chariot = None
+    for ray in RAYS[square]:
+        screened = False
+        for ray_x, ray_y in ray:
+            piece_id = board[ray_x][ray_y]
+            if piece_id == 0:
+                continue
+            if not screened:
+                if piece_id == 6 * sign and chariot is None:
+                    chariot = (ray_x, ray_y)
+                screened = True
+            else:
+                if piece_id == 5 * sign:
+                    return ray_x, ray_y
+                break
+    if chariot is not None:
+        return chariot
+
+    for attacker_x, attacker_y in KING_ATTACKS[7 * sign][square]:
+        if board[attacker_x][attacker_y] == 7 * sign:
+            return attacker_x, attacker_y
+    return None
+
+
+def static_exchange(board, action):
+    """
+    Static exchange evaluation: the material that the side playing the capture action wins once the exchange on
+    the captured square settles, both sides recapturing with their least valuable attacker for as long as it
+    pays. Pieces moved into the exchange uncover the Chariots and Cannon screens behind them, Horse legs and
+    Elephant eyes included. Position values, pins and checks are ignored.
+
+    The board is changed during the evaluation and restored before returning.
+
+    Args:
+        - board: the chessboard.
+        - action: a capture (old_x, old_y, new_x, new_y).
+
+    Returns:
+        - gain: in units of PIECE_VALUE, negative when the capture loses material.
+    """
+
+    old_x, old_y, new_x, new_y = action[0], action[1], action[2], action[3]
+    target_id = board[new_x][new_y]
+    piece_id = board[old_x][old_y]
+    removed = [(old_x, old_y, piece_id)]
+    board[old_x][old_y] = 0
+    gains = [abs(PIECE_VALUE[target_id])]
+    sign = -1 if piece_id > 0 else 1
+
+    # gains[d]: what the side making capture d wins if the exchange stopped right after it
+    while True:
+        attacker = get_least_attacker(board, new_x, new_y, sign)
+        if attacker is None:
+            break
+        gains.append(abs(PIECE_VALUE[piece_id]) - gains[-1])
+        attacker_x, attacker_y = attacker
+        piece_id = board[attacker_x][attacker_y]
+        removed.append((attacker_x, attacker_y, piece_id))
+        board[attacker_x][attacker_y] = 0
+        sign = -sign
+
+    for x, y, removed_id in removed:
+        board[x][y] = removed_id
+    board[new_x][new_y] = target_id
+
+    # Each side may decline to recapture
+    for depth in range(len(gains) - 1, 0, -1):
+        gains[depth - 1] = -max(-gains[depth - 1], gains[depth])
+    return gains[0]
+
+
+# Get the squares that can not be changed without possibly exposing the King at (King_x, King_y)
+def get_pinned_squares(board, King_x, King_y):
+    """
+    Return the squares of the pieces pinned to the King (the piece in front of an enemy Chariot or facing
+    King, the two screens in front of an enemy Cannon, a blocked horse leg), together with the empty squares
+    between the King and an enemy Cannon, where a moved piece would become a screen.
+    Only actions leaving or entering these squares need the full King safety test.
+    """
+
+    sign = 1 if board[King_x][King_y] > 0 else -1
+    square = King_x * 9 + King_y
+    pinned = set()
+
+    for direction, ray in enumerate(RAYS[square]):
+        empty = []
+        pieces = []
+        for x, y in ray:
+            if board[x][y] == 0:
+                if not pieces:
+                    empty.append((x, y))
+                continue
+            pieces.append((x, y))
+            if len(pieces) == 3:
+                break
+
+        if len(pieces) >= 1 and board[pieces[0][0]][pieces[0][1]] == -5 * sign:
+            pinned.update(empty)
+        if len(pieces) >= 2:
+            piece_id = board[pieces[1][0]][pieces[1][1]]
+            if piece_id == -6 * sign or (piece_id == -7 * sign and direction < 2):
+                pinned.add(pieces[0])
+        if len(pieces) == 3 and board[pieces[2][0]][pieces[2][1]] == -5 * sign:
+            pinned.add(pieces[0])
+            pinned.add(pieces[1])
+
+    for x, y, leg_x, leg_y in HORSE_ATTACKS[square]:
+        if board[x][y] == -4 * sign and board[leg_x][leg_y] != 0:
+            pinned.add((leg_x, leg_y))
+
+    return pinned
+
+
 # Check if King is attacked
 def check_King_attacked(board, action, red_piece, black_piece):
 
+    if board[action[0]][action[1]] > 0:
+        # Red_King is at the end of red_piece
+        return check_King_exposed(board, action, red_piece[-1][1], red_piece[-1][2])
+    else:
+        # Black_King is at the end of black_piece
+        return check_King_exposed(board, action, black_piece[-1][1], black_piece[-1][2])
+
+
+# Check if the King of the moving side, standing on (King_x, King_y), is attacked after action
+def check_King_exposed(board, action, King_x, King_y):
+
     old_x = action[0]
     old_y = action[1]
     new_x = action[2]
@@ -355,57 +783,168 @@ def check_King_attacked(board, action, red_piece, black_piece):
     piece_id = board[old_x][old_y]
 
     # Simulate moving chess piece
-    IsAttacked = False
     eaten_id = board[new_x][new_y]
     board[new_x][new_y] = piece_id
     board[old_x][old_y] = 0
 
-    if piece_id > 0:   # Judge whether Red King will be attacked
+    if piece_id in (7, -7):
+        King_x = new_x
+        King_y = new_y
 
-        if piece_id == 7:
-            Red_King_x = new_x
-            Red_King_y = new_y
-        else:
-            # Red_King is at the end of red_piece
-            Red_King_x = red_piece[-1][1]
-            Red_King_y = red_piece[-1][2]
+    IsAttacked = is_King_attacked(board, King_x, King_y)
 
-        for piece in black_piece:
-            if piece == (eaten_id, new_x, new_y):
-                continue
-            black_piece_id = piece[0]
-            black_piece_x = piece[1]
-            black_piece_y = piece[2]
+    # Restore the position of moved chess piece
+    board[old_x][old_y] = piece_id
+    board[new_x][new_y] = eaten_id
 
-            if rule(board, black_piece_id, black_piece_x, black_piece_y, Red_King_x, Red_King_y):
-                IsAttacked = True
-                break
+    return IsAttacked
+
+
+# The history entry of a null move (a pass) made by a search. No action moves a piece onto its own square
+NULL_ACTION = (0, 0, 0, 0, 0)
 
-    elif piece_id < 0:   # Judge whether Black King will be attacked
 
-        if piece_id == -7:
-            Black_King_x = new_x
-            Black_King_y = new_y
+class CheckRecord:
+    """
+    Rolling record of the checks given in the last plies, used to forbid a piece attacking King for three times.
+
+    Each entry is (old_x, old_y, new_x, new_y, checkers) for one ply, where checkers is the set of squares of the
+    mover's pieces giving check right after it. Entries alternate between the two sides, so entries[-2], [-4]
+    and [-6] are the previous actions of the side to move. The record is updated with push and pop as actions
+    are made and taken back, and is_perpetual is a few lookups with no board copy.
+    """
+
+    __slots__ = ("length", "entries")
+
+    def __init__(self):
+        self.length = 0     # Number of plies in the game so far, which may exceed len(self.entries)
+        self.entries = []
+
+    @classmethod
+    def from_history(cls, board, history):
+        """Build the record covering the last six plies of history, for a board reached by playing history."""
+
+        record = cls()
+        plies = history[-6:]
+        record.length = len(history) - len(plies)
+
+        # Take back the plies in place, then play them again while recording the checks.
+        # The touched squares are saved first, so board comes back unchanged even if history does not match it
+        saved = [(ply[i], ply[i + 1], board[ply[i]][ply[i + 1]]) for ply in plies for i in (0, 2)]
+        for old_x, old_y, new_x, new_y, eaten_id in reversed(plies):
+            board[old_x][old_y] = board[new_x][new_y]
+            board[new_x][new_y] = eaten_id
+        for ply in plies:
+            board[ply[2]][ply[3]] = board[ply[0]][ply[1]]
+            board[ply[0]][ply[1]] = 0
+            record.push(board, ply)
+        for x, y, piece_id in reversed(saved):
+            board[x][y] = piece_id
+
+        return record
+
+    def push(self, board, action):
+        """Record an action that has just been made on board."""
+
+        new_x = action[2]
+        new_y = action[3]
+        side = "black" if board[new_x][new_y] > 0 else "red"
+        King = get_King_location(board, side)
+        if King is None:
+            checkers = frozenset()
         else:
-            # Black_King is at the end of red_piece
-            Black_King_x = black_piece[-1][1]
-            Black_King_y = black_piece[-1][2]
+            checkers = frozenset(get_King_attackers(board, King[0], King[1]))
+        self.entries.append((action[0], action[1], new_x, new_y, checkers))
+        self.length += 1
+
+    def pop(self):
+        """Forget the last recorded action, after it has been taken back."""
+
+        self.entries.pop()
+        self.length -= 1
+
+    def perpetual_square(self):
+        """
+        The square of the only piece of the side to move whose actions is_perpetual may forbid, or None.
+
+        The piece arrived there with a check, the same piece checked on the move before that, and it was
+        already attacking King from there one more move earlier. With the board, this square decides every
+        answer of is_perpetual.
+        """
+
+        if self.length <= 6 or len(self.entries) < 6:
+            return None
+
+        last = self.entries[-2]
+        earlier = self.entries[-4]
+        first = self.entries[-6]
+        if (last[2], last[3]) not in last[4]:
+            return None
+        if (earlier[2], earlier[3]) != (last[0], last[1]) or (last[0], last[1]) not in earlier[4]:
+            return None
+        if (earlier[0], earlier[1]) not in first[4]:
+            return None
+        return last[2], last[3]
+
+    def is_perpetual(self, board, action):
+        """Whether action makes the same piece attack King for three times."""
+
+        old_x, old_y, new_x, new_y = action[0], action[1], action[2], action[3]
+        if self.perpetual_square() != (old_x, old_y):
+            return False
 
-        for piece in red_piece:
-            if piece == (eaten_id, new_x, new_y):
-                continue
-            red_piece_id = piece[0]
-            red_piece_x = piece[1]
-            red_piece_y = piece[2]
-            if rule(board, red_piece_id, red_piece_x, red_piece_y, Black_King_x, Black_King_y):
-                IsAttacked = True
-                break
+        # Simulate current action to check if King is attacked once more
+        piece_id = board[old_x][old_y]
+        eaten_id = board[new_x][new_y]
+        board[new_x][new_y] = piece_id
+        board[old_x][old_y] = 0
+        King = get_King_location(board, "black" if piece_id > 0 else "red")
+        IsPerpetual = King is not None and rule(board, piece_id, new_x, new_y, King[0], King[1])
+        board[old_x][old_y] = piece_id
+        board[new_x][new_y] = eaten_id
 
-    # Restore the position of moved chess piece
-    board[old_x][old_y] = piece_id
-    board[new_x][new_y] = eaten_id
+        return IsPerpetual
 
-    return IsAttacked
+
+def get_check_record(board, history):
+    """
+    The CheckRecord that get_legal_actions builds from history, or None for a history too short to matter.
+
+    When the side to move did not move the same piece on its last two actions, no action can be perpetual,
+    and an empty record is returned without replaying history. So it is when one of the last six plies is a
+    null move (NULL_ACTION), after which the plies no longer alternate between the two sides.
+    """
+
+    if len(history) <= 6:
+        return None
+    if NULL_ACTION in history[-6:]:
+        return CheckRecord()
+    last = history[-2]
+    earlier = history[-4]
+    if (earlier[2], earlier[3]) != (last[0], last[1]):
+        return CheckRecord()
+    return CheckRecord.from_history(board, history)
+
+
+def is_legal_action(board, side, action, check_record=None):
+    """
+    Whether action is one of get_legal_actions(board, side, history, check_record), tested alone.
+
+    Args:
+        - check_record: the CheckRecord of history, as get_check_record, or None to leave out the perpetual
+            check rule.
+    """
+
+    old_x, old_y, new_x, new_y = action[0], action[1], action[2], action[3]
+    piece_id = board[old_x][old_y]
+    if piece_id == 0 or (piece_id > 0) != (side == "red"):
+        return False
+    if (old_x, old_y, new_x, new_y) not in get_one_piece_action(board, piece_id, old_x, old_y):
+        return False
+    King = get_King_location(board, side)
+    if King is None or check_King_exposed(board, action, King[0], King[1]):
+        return False
+    return check_record is None or not check_record.is_perpetual(board, action)
 
 
 # Check if there is some piece attacking King for three times
@@ -414,73 +953,71 @@ def check_history(board, action, history):
     if len(history) <= 6:
         return False
 
-    copy_board = copy.deepcopy(board)
-
-    piece_x = action[0]
-    piece_y = action[1]
-    new_x = action[2]
-    new_y = action[3]
-    piece_id = copy_board[piece_x][piece_y]
+    return get_check_record(board, history).is_perpetual(board, action)
 
-    if piece_id > 0:
-        side = "black"
-    elif piece_id < 0:
-        side = "red"
 
-    # Simulate current action to check if King is attacked in action
-    eaten_id = copy_board[new_x][new_y]
-    copy_board[new_x][new_y] = piece_id
-    copy_board[piece_x][piece_y] = 0
+class LegalActionCache:
+    """
+    A bounded LRU cache of the lists of get_legal_actions, for positions reached again through another order
+    of the same actions.
 
-    King_x, King_y = get_King_location(copy_board, side)
-    if rule(copy_board, piece_id, new_x, new_y, King_x, King_y):    # King is attacked next step
+    A list is keyed by the Zobrist hash of the position (side to move included) and the perpetual_square of
+    its CheckRecord, which together decide every legal action. The least recently used list is dropped when
+    more than max_entries are held.
 
-        # Restore the position of simulate moved chess piece
-        copy_board[piece_x][piece_y] = piece_id
-        copy_board[new_x][new_y] = eaten_id
+    Args:
+        - max_entries: the number of lists kept.
+    """
 
-        # Back to board state one step ago
-        copy_board[history[-1][0]][history[-1][1]
-                                   ] = copy_board[history[-1][2]][history[-1][3]]
-        copy_board[history[-1][2]][history[-1][3]] = history[-1][4]
+    def __init__(self, max_entries: int = 10000):
 
-        King_x, King_y = get_King_location(copy_board, side)
+        self.max_entries = max_entries
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
-        # The same piece attacks King for one time
-        if copy_board[piece_x][piece_y] == piece_id and rule(copy_board, piece_id, piece_x, piece_y, King_x, King_y):
+    def get_legal_actions(self, board: tuple, side: str, history: list, board_hash: int, check_record=None):
+        """
+        The list of get_legal_actions(board, side, history, check_record), a new list the caller may reorder.
 
-            # Back to board state three steps ago
-            copy_board[history[-2][0]][history[-2][1]
-                                       ] = copy_board[history[-2][2]][history[-2][3]]
-            copy_board[history[-2][2]][history[-2][3]] = history[-2][4]
+        Args:
+            - board_hash: the Zobrist hash of board with side to move, as zobrist.hash_board.
+        """
 
-            copy_board[history[-3][0]][history[-3][1]
-                                       ] = copy_board[history[-3][2]][history[-3][3]]
-            copy_board[history[-3][2]][history[-3][3]] = history[-3][4]
+        if check_record is None:
+            check_record = get_check_record(board, history)
+        key = (board_hash, None if check_record is None else check_record.perpetual_square())
 
-            King_x, King_y = get_King_location(copy_board, side)
+        table = self.table
+        actions = table.get(key)
+        if actions is not None:
+            self.hits += 1
+            table.move_to_end(key)
+            return list(actions)
 
-            # The same piece attacks King for two times
-            if (history[-2][2], history[-2][3]) == (piece_x, piece_y) and rule(copy_board, piece_id, history[-2][0], history[-2][1], King_x, King_y):
+        self.misses += 1
+        action_list = get_legal_actions(board, side, history, check_record)
+        table[key] = tuple(action_list)
+        if len(table) > self.max_entries:
+            table.popitem(last=False)
+        return action_list
 
-                # Back to board state five steps ago
-                copy_board[history[-4][0]][history[-4][1]
-                                           ] = copy_board[history[-4][2]][history[-4][3]]
-                copy_board[history[-4][2]][history[-4][3]] = history[-4][4]
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
 
-                copy_board[history[-5][0]][history[-5][1]
-                                           ] = copy_board[history[-5][2]][history[-5][3]]
-                copy_board[history[-5][2]][history[-5][3]] = history[-5][4]
+    def stats(self):
+        """Counters of the cache since the last reset_stats, and how full it is."""
 
-                King_x, King_y = get_King_location(copy_board, side)
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self.table)}
 
-                # The same piece attacks King for three times
-                if (history[-4][2], history[-4][3]) == (history[-2][0], history[-2][1]) and rule(copy_board, piece_id, history[-4][0], history[-4][1], King_x, King_y):
-                    return True
-    return False
+    def clear(self):
+        self.table.clear()
 
 
-def get_King_location(board, side):  # Get position of King. Used for check_histroy
+def get_King_location(board, side):  # Get position of King. Used for CheckRecord
     if side == "red":
         for i in (7, 8, 9):
             for j in (3, 4, 5):
@@ -499,3 +1036,124 @@ def change_round(side):
         return "black"
     elif side == "black":
         return "red"
+
+
+# ---------------------------------Compact Representation---------------------------------
+# An optional compact form for search internals: the board as a flat array('b') of 90 squares indexed by
+# x * 9 + y, and an action packed into one int holding the old square (bits 0-6), the new square (bits 7-13)
+# and the eaten piece id + 7 (bits 14-17). A packed move carries the same information as a history entry.
+# Convert at the policy() boundary with the functions below.
+
+_SQUARE_XY = tuple(divmod(square, 9) for square in range(90))
+
+
+def encode_move(old_x, old_y, new_x, new_y, eaten_id=0):
+    return (old_x * 9 + old_y) | (new_x * 9 + new_y) << 7 | (eaten_id + 7) << 14
+
+
+def decode_move(move):  # Back to a history entry (old_x, old_y, new_x, new_y, eaten_id)
+    old_x, old_y = _SQUARE_XY[move & 127]
+    new_x, new_y = _SQUARE_XY[move >> 7 & 127]
+    return old_x, old_y, new_x, new_y, (move >> 14) - 7
+
+
+def action_to_move(board, action):  # Pack an action about to be made on board
+    return encode_move(action[0], action[1], action[2], action[3], board[action[2]][action[3]])
+
+
+def move_to_action(move):   # Back to the four-element action returned by policy()
+    old_x, old_y = _SQUARE_XY[move & 127]
+    new_x, new_y = _SQUARE_XY[move >> 7 & 127]
+    return old_x, old_y, new_x, new_y
+
+
+def encode_history(history):
+    return array('l', [encode_move(*entry) for entry in history])
+
+
+def decode_history(moves):
+    return [decode_move(move) for move in moves]
+
+
+def to_flat_board(board):
+    return array('b', [piece_id for row in board for piece_id in row])
+
+
+def from_flat_board(flat_board):
+    return tuple(list(flat_board[i * 9:i * 9 + 9]) for i in range(10))
+
+
+def get_legal_moves(board, side, history, check_record=None):
+    """The actions of get_legal_actions packed into ints, with the eaten piece of each one."""
+
+    return [encode_move(action[0], action[1], action[2], action[3], board[action[2]][action[3]])
+            for action in get_legal_actions(board, side, history, check_record)]
+
+# ---------------------------------Evaluation---------------------------------
+# Values shared by the evaluators of the players: material of every piece id (positive for red)
+PIECE_VALUE = {7: 1000000, 6: 600, 5: 300, 4: 300, 3: 110, 2: 110, 1: 70,
+               -7: -1000000, -6: -600, -5: -300, -4: -300, -3: -110, -2: -110, -1: -70, 0: 0}
+
+# Position value of Cannon, Horse, Chariot and Pawn, seen from the red side
+CANNON_POSITION = ((6, 4, 0, -10, -12, -10, 0, 4, 6),
+                   (2, 2, 0, -4, -14, -4, 0, 2, 2),
+                   (2, 2, 0, -10, -8, -10, 0, 2, 2),
+                   (0, 0, -2, 4, 10, 4, -2, 0, 0),
+                   (0, 0, 0, 2, 8, 2, 0, 0, 0),
+                   (-2, 0, 4, 2, 6, 2, 4, 0, -2),
+                   (0, 0, 0, 2, 4, 2, 0, 0, 0),
+                   (4, 0, 8, 6, 10, 6, 8, 0, 4),
+                   (0, 2, 4, 6, 6, 6, 4, 2, 0),
+                   (0, 0, 2, 6, 6, 6, 2, 0, 0))
+HORSE_POSITION = ((4, 8, 16, 12, 4, 12, 16, 8, 4),
+                  (4, 10, 28, 16, 8, 16, 28, 10, 4),
+                  (12, 14, 16, 20, 18, 20, 16, 14, 12),
+                  (8, 24, 18, 24, 20, 24, 18, 24, 8),
+                  (6, 16, 14, 18, 16, 18, 14, 16, 6),
+                  (4, 12, 16, 14, 12, 14, 16, 12, 4),
+                  (2, 6, 8, 6, 10, 6, 8, 6, 2),
+                  (4, 2, 8, 8, 4, 8, 8, 2, 4),
+                  (0, 2, 4, 4, -2, 4, 4, 2, 0),
+                  (0, -4, 0, 0, 0, 0, 0, -4, 0))
+CHARIOT_POSITION = ((14, 14, 12, 18, 16, 18, 12, 14, 14),
+                    (16, 20, 18, 24, 26, 24, 18, 20, 16),
+                    (12, 12, 12, 18, 18, 18, 12, 12, 12),
+                    (12, 18, 16, 22, 22, 22, 16, 18, 12),
+                    (12, 14, 12, 18, 18, 18, 12, 14, 12),
+                    (12, 16, 14, 20, 20, 20, 14, 16, 12),
+                    (6, 10, 8, 14, 14, 14, 8, 10, 6),
+                    (4, 8, 6, 14, 12, 14, 6, 8, 4),
+                    (8, 4, 8, 16, 8, 16, 8, 4, 8),
+                    (-2, 10, 6, 14, 12, 14, 6, 10, -2))
+PAWN_POSITION = ((0, 3, 6, 9, 12, 9, 6, 3, 0),
+                 (18, 36, 56, 80, 120, 80, 56, 36, 18),
+                 (14, 26, 42, 60, 80, 60, 42, 26, 14),
+                 (10, 20, 30, 34, 40, 34, 30, 20, 10),
+                 (6, 12, 18, 18, 20, 18, 18, 12, 6),
+                 (2, 0, 8, 0, 8, 0, 8, 0, 2),
+                 (0, 0, -2, 0, 4, 0, -2, 0, 0),
+                 (0, 0, 0, 0, 0, 0, 0, 0, 0),
+                 (0, 0, 0, 0, 0, 0, 0, 0, 0),
+                 (0, 0, 0, 0, 0, 0, 0, 0, 0))
+
+
+def _build_position_value():
+    # For every piece id, its signed position value on each square; black reads the tables upside down
+    position_value = {}
+    tables = {5: CANNON_POSITION, 4: HORSE_POSITION, 6: CHARIOT_POSITION, 1: PAWN_POSITION}
+    for piece_id in range(-7, 8):
+        table = tables.get(abs(piece_id))
+        values = []
+        for i in range(10):
+            for j in range(9):
+                if table is None:
+                    values.append(0)
+                elif piece_id > 0:
+                    values.append(table[i][j])
+                else:
+                    values.append(-table[9 - i][j])
+        position_value[piece_id] = tuple(values)
+    return position_value
+
+
+POSITION_VALUE = _build_position_value()
@@ -0,0 +1,58 @@
+import random
+from array import array
+
+# Shared Zobrist keys of all players and the opening book.
+# The keys are drawn from a fixed seed, so a hash is the same in every process and every run, and a hash
+# stored on disk (opening book, position index) stays valid.
+ZOBRIST_SEED = 20240101
+
+
+def _build_keys(seed=ZOBRIST_SEED):
+    # One 64-bit key per (square, piece id) at index square * 15 + piece_id + 7, empty squares hash to 0,
+    # and the key of the side to move is drawn last
+    rng = random.Random(seed)
+    keys = array('Q')
+    for square in range(90):
+        for piece_id in range(-7, 8):
+            keys.append(0 if piece_id == 0 else rng.getrandbits(64))
+    return keys, rng.getrandbits(64)
+
+
+PIECE_KEYS, SIDE_KEY = _build_keys()     # SIDE_KEY is XORed in when black is to move
+
+
+def key_index(x, y, piece_id):
+    return (x * 9 + y) * 15 + piece_id + 7
+
+
+def hash_board(board, side="red"):
+    """
+    Compute the Zobrist hash of a position from scratch.
+
+    Args:
+        - board: the 10×9 chessboard.
+        - side: the side to move, "red" or "black".
+
+    Returns:
+        - hash_value: the 64-bit hash of the pieces and the side to move.
+    """
+
+    keys = PIECE_KEYS
+    hash_value = SIDE_KEY if side == "black" else 0
+    for i in range(10):
+        row = board[i]
+        for j in range(9):
+            if row[j] != 0:
+                hash_value ^= keys[(i * 9 + j) * 15 + row[j] + 7]
+    return hash_value
+
+
+def move_key(hash_value, piece_id, old_square, new_square, eaten_id=0):
+    """
+    Update a hash by XOR for piece_id moving from old_square to new_square (x * 9 + y) and eating eaten_id.
+
+    XOR is its own inverse: the same call with the same arguments takes the action back.
+    """
+
+    return hash_value ^ PIECE_KEYS[old_square * 15 + piece_id + 7] ^ PIECE_KEYS[new_square * 15 + piece_id + 7] \
+        ^ PIECE_KEYS[new_square * 15 + eaten_id + 7] ^ SIDE_KEY